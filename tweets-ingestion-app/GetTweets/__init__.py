@@ -1,41 +1,33 @@
 import os
-import json
+import asyncio
 import logging
 from datetime import datetime, timedelta, timezone
+from typing import Iterator, Optional
 import azure.functions as func
-import re
-from azure.identity import DefaultAzureCredential
+from azure.identity import DefaultAzureCredential, get_bearer_token_provider
 from azure.core.credentials import AzureKeyCredential
 from azure.keyvault.secrets import SecretClient
 from azure.storage.blob import BlobServiceClient
+from azure.search.documents import SearchClient
 from azure.search.documents.indexes import SearchIndexerClient
+from openai import AzureOpenAI
 import tweepy
-from .chunking import chunk_text, generate_chunk_id
-
-# Frozen now for timestamp
-now = datetime.now(timezone.utc)
-
-# RegEx pattern for naive CDC filtering
-CDC_PATTERN = re.compile(
-    r"""
-    (?:            
-        \bCDC\b      
-        (?![A-Za-z0-9_])  
-    )
-    |
-    (?:\bCenters\s+for\s+Disease\s+Control(?:\s+and\s+Prevention)?\b)
-    |
-    (?:@CDCgov)
-    |
-    (?<![#\w])\#CDC(?![A-Za-z0-9_]) 
-    """,
-    re.IGNORECASE | re.VERBOSE
-)
+import tweepy.asynchronous
+from .chunking import chunk_texts, generate_chunk_id
+from .storage import upload_chunks, load_checkpoint, save_checkpoint, \
+    CHECKPOINT_BLOB_PATH
+from .seen_ids import SeenChunkIds, SEEN_IDS_BLOB_PATH
+from .embeddings import EmbeddingCache, embed_chunks, EMBEDDING_CACHE_BLOB_PATH
+from .near_duplicates import NearDuplicateIndex, NEAR_DUPLICATES_BLOB_PATH
+from .relevance import CDC_PATTERN, RELEVANCE_THRESHOLD, score_relevance
+from .records import TweetRecord
+from .indexing import push_chunks, push_documents, MAX_BATCH_BYTES
+
 
 def main(dailytimer: func.TimerRequest) -> None:
     """Function that pulls tweets about the Centers for Disease Control 
-    and Prevention (CDC), format for AI Search index schema, push to blob 
-    storage, and run indexer.
+    and Prevention (CDC), format for AI Search index schema, push to the 
+    index and blob storage, and run indexer.
 
     Parameters:
         dailytimer (func.TimerRequest): The trigger that defines
@@ -53,6 +45,12 @@ def main(dailytimer: func.TimerRequest) -> None:
     # Variable for number of pages
     num_pages = 4
 
+    # Variable for number of time slices of the last 24 hours fetched concurrently
+    num_slices = 4
+
+    # Variable for number of Twitter API requests in flight at once
+    max_concurrency = 4
+
     # Variable for number of tweets to add to index
     num_top_tweets = 5
 
@@ -65,6 +63,38 @@ def main(dailytimer: func.TimerRequest) -> None:
     # Variable for the encoding model tiktoken will use to compute tokens
     encoding_model = "text-embedding-3-small"
 
+    # Variable for number of days an uploaded chunk id is remembered to skip re-uploads
+    seen_ids_retention_days = 7
+
+    # Variable for number of days an idle near-duplicate cluster is remembered
+    near_duplicate_retention_days = 3
+
+    # Variable for whether chunks are embedded here instead of by the indexer skill,
+    # the embedding skill must be restored in the skillset when this is turned off
+    precompute_embeddings = True
+
+    # Variable for number of chunk texts sent in one embeddings request
+    embedding_batch_size = 256
+
+    # Variable for number of embeddings requests in flight at once
+    embedding_max_concurrency = 4
+
+    # Variable for number of dimensions of the text_vector index field
+    embedding_dimensions = 1536
+
+    # Variable for number of days an unused cached embedding is kept
+    embedding_cache_retention_days = 3
+
+    # Variable for whether chunks are pushed straight to the index so they are
+    # searchable in seconds, the indexer still runs afterwards for enrichment
+    push_to_index = True
+
+    # Variable for number of payload bytes in one indexing request
+    push_batch_bytes = MAX_BATCH_BYTES
+
+    # Variable for number of indexing requests in flight at once
+    push_max_concurrency = 4
+
     # --------------------------------------------------------------------------
 
     logging.info("Started CDC Tweets Ingestion Function App")
@@ -77,12 +107,45 @@ def main(dailytimer: func.TimerRequest) -> None:
 
     twitter_token = keyvault_client.get_secret("TWITTER-BEARER-TOKEN").value
 
-    all_tweets, id_to_username_map = pull_tweets(twitter_token=twitter_token, max_results=max_results, 
-                             num_pages=num_pages)
+    # Timestamp of this run, computed per invocation since the worker is reused
+    now = datetime.now(timezone.utc)
+
+    blob_url = keyvault_client.get_secret("TWEETS-BLOB-URL").value
+    blob_container = keyvault_client.get_secret("TWEETS-BLOB-CONTAINER").value
+    blob_service = BlobServiceClient(account_url=blob_url, credential=credential)
+
+    checkpoint_client = blob_service.get_blob_client(container=blob_container, 
+                                                     blob=CHECKPOINT_BLOB_PATH)
+    checkpoint = load_checkpoint(blob_client=checkpoint_client)
+
+    # Only query the part of the last 24 hours after the newest ingested tweet
+    start_time = now - timedelta(days=1)
+    since_id = None
+    if checkpoint is not None and datetime.fromisoformat(checkpoint["created_at"]) > start_time:
+        since_id = checkpoint["since_id"]
+        start_time = datetime.fromisoformat(checkpoint["created_at"])
+        logging.info("Resuming after tweet {}".format(since_id))
+
+    all_tweets, id_to_username_map, newest_tweet, checkpoint_tweet = pull_tweets(twitter_token=twitter_token, 
+                             max_results=max_results, 
+                             num_pages=num_pages, num_slices=num_slices, 
+                             max_concurrency=max_concurrency, start_time=start_time, 
+                             end_time=now, since_id=since_id)
     
-    logging.info("Pulled {} on {}.".format(len(all_tweets), 
+    logging.info("Pulled {} relevant tweets on {}.".format(len(all_tweets), 
                                         now.strftime("%B %d, %Y")))
-    logging.info(all_tweets)
+
+    if newest_tweet is None:
+        logging.info("No new tweets since last run")
+        return
+
+    if not all_tweets:
+        # Still move the checkpoint past the irrelevant tweets
+        logging.info("No relevant tweets since last run")
+        if checkpoint_tweet is not None:
+            save_checkpoint(blob_client=checkpoint_client, since_id=checkpoint_tweet[0], 
+                            created_at=checkpoint_tweet[1].isoformat())
+        return
     
     # top_tweets = get_top_n_tweets(all_tweets=all_tweets, n=num_top_tweets)
 
@@ -91,49 +154,115 @@ def main(dailytimer: func.TimerRequest) -> None:
     chunks = get_chunked_tweets(tweets=all_tweets, chunk_size=chunk_size, 
                                 chunk_overlap=chunk_overlap, 
                                 encoding_model=encoding_model, 
-                                id_to_username_map=id_to_username_map)
+                                id_to_username_map=id_to_username_map,
+                                ingestion_date=now)
     # logging.info("Chunked top {} tweets into {} total chunks"
     #              .format(num_top_tweets, len(chunks)))
     
-    blob_url = keyvault_client.get_secret("TWEETS-BLOB-URL").value
-    blob_container = keyvault_client.get_secret("TWEETS-BLOB-CONTAINER").value
+    # Each run writes to its own path so the indexer only picks up new documents
     prev_date = (now - timedelta(1)).date()
-    blob_path = "{}/cdc-chunks.json".format(prev_date)
+    blob_path = "{}/{}/cdc-chunks.json".format(prev_date, now.strftime("%Y%m%dT%H%M%SZ"))
+
+    # Drop chunks that were already uploaded so they are not enriched again
+    seen_ids_client = blob_service.get_blob_client(container=blob_container, 
+                                                   blob=SEEN_IDS_BLOB_PATH)
+    seen_ids = SeenChunkIds.load(blob_client=seen_ids_client, 
+                                 retention_days=seen_ids_retention_days)
+
+    chunks = seen_ids.filter_unseen(chunks)
+
+    # Copies of the same headline are indexed once, the cluster totals are
+    # merged into the representative after the upload
+    near_duplicates_client = blob_service.get_blob_client(container=blob_container, 
+                                                          blob=NEAR_DUPLICATES_BLOB_PATH)
+    near_duplicates = NearDuplicateIndex.load(blob_client=near_duplicates_client, 
+                                              retention_days=near_duplicate_retention_days)
+    chunks = near_duplicates.collapse(chunks=chunks)
+
+    if precompute_embeddings:
+        embedding_cache_client = blob_service.get_blob_client(container=blob_container, 
+                                                              blob=EMBEDDING_CACHE_BLOB_PATH)
+        embedding_cache = EmbeddingCache.load(blob_client=embedding_cache_client, 
+                                              retention_days=embedding_cache_retention_days)
+
+        openai_client = AzureOpenAI(
+            azure_endpoint=keyvault_client.get_secret("OPENAI-ENDPOINT").value,
+            api_version=keyvault_client.get_secret("OPENAI-API-VERSION").value,
+            azure_ad_token_provider=get_bearer_token_provider(
+                credential, "https://cognitiveservices.azure.com/.default"),
+            max_retries=5
+        )
+        embedding_deployment = keyvault_client.get_secret("OPENAI-EMBEDDING-DEPLOYMENT-NAME").value
+        chunks = embed_chunks(chunks=chunks, openai_client=openai_client, 
+                              deployment=embedding_deployment, 
+                              cache=embedding_cache, 
+                              dimensions=embedding_dimensions, 
+                              batch_size=embedding_batch_size, 
+                              max_concurrency=embedding_max_concurrency)
 
-    blob_service = BlobServiceClient(account_url=blob_url, credential=credential)
+    search_endpoint = keyvault_client.get_secret("SEARCH-ENDPOINT").value
+    search_key = keyvault_client.get_secret("SEARCH-KEY").value
+    indexer_name = keyvault_client.get_secret("SEARCH-INDEXER-NAME").value
+    index_name = keyvault_client.get_secret("SEARCH-INDEX-NAME").value
+    search_client = SearchClient(endpoint=search_endpoint, index_name=index_name, 
+                                 credential=AzureKeyCredential(search_key))
+
+    if push_to_index:
+        # Chunks are pushed as they are written to blob storage, in one pass
+        chunks = push_chunks(search_client=search_client, chunks=chunks, 
+                             max_batch_bytes=push_batch_bytes, 
+                             max_concurrency=push_max_concurrency)
 
     blob_client = blob_service.get_blob_client(container=blob_container, 
                                                blob=blob_path)
-    blob_client.upload_blob(json.dumps(obj=chunks, indent=2), overwrite=True)
+    num_chunks = upload_chunks(blob_client=blob_client, chunks=chunks)
 
-    logging.info("Uploaded {} chunks to path {}".format(len(chunks), blob_path))
+    logging.info("Uploaded {} chunks to path {}".format(num_chunks, blob_path))
 
-    search_endpoint = keyvault_client.get_secret("SEARCH-ENDPOINT").value
-    search_key = keyvault_client.get_secret("SEARCH-KEY").value
-    indexer_name = keyvault_client.get_secret("SEARCH-INDEXER-NAME").value
+    # The indexer does not map the cluster fields, so these merges are kept
+    # when it later indexes the representatives. Representatives that are not
+    # indexed yet are skipped, their totals are pushed when the cluster grows
+    push_documents(search_client=search_client, documents=near_duplicates.cluster_updates(), 
+                   max_batch_bytes=push_batch_bytes, max_concurrency=push_max_concurrency)
+
+    seen_ids.save(blob_client=seen_ids_client, today=now.date())
+    near_duplicates.save(blob_client=near_duplicates_client, today=now.date())
+    if precompute_embeddings:
+        embedding_cache.save(blob_client=embedding_cache_client, today=now.date())
+
+    # Slices the page budget cut short are pulled again by the next run, the
+    # chunks already uploaded from them are dropped as seen
+    if checkpoint_tweet is not None:
+        save_checkpoint(blob_client=checkpoint_client, since_id=checkpoint_tweet[0], 
+                        created_at=checkpoint_tweet[1].isoformat())
 
     indexer_client = SearchIndexerClient(endpoint=search_endpoint, 
                                          credential=AzureKeyCredential(search_key))
     try:
         indexer_client.run_indexer(name=indexer_name)
+        # PublishDataVersion publishes the new data version once the run succeeds
         logging.info("Succesfully ran indexer {}".format(indexer_name))
     except Exception as e:
         logging.info("Error running indexer {}".format(indexer_name))
 
 
-def get_chunked_tweets(tweets: list[any], chunk_size: int, 
+def get_chunked_tweets(tweets: list[TweetRecord], chunk_size: int, 
                        chunk_overlap: int, encoding_model: str, 
-                       id_to_username_map: dict) -> list[str]:
-    """Function that returns tweet chunks from the list of tweets.
+                       id_to_username_map: dict, 
+                       ingestion_date: datetime) -> Iterator[dict]:
+    """Function that yields tweet chunks from the list of tweets so they can
+    be streamed to storage without building the full list in memory.
 
     Parameters:
-        tweets (list[any]): The list of tweets
+        tweets (list[TweetRecord]): The list of relevant tweets
         chunk_size (int): The number of tokens per chunk
         chunk_overlap (int): The number of token overlap between chunks of the same tweet
         encoding_model (str): The name of the model used to compute tokens from text
+        id_to_username_map (dict): The map of author id to username
+        ingestion_date (datetime): The timestamp of the ingestion run
 
     Returns:
-        list[str]: The list of chunks
+        Iterator[dict]: The chunks, in tweet order
     """
     # # For future enrichment 
     # hashtags_cleaned = []
@@ -152,120 +281,316 @@ def get_chunked_tweets(tweets: list[any], chunk_size: int,
     #             if m.get("type") == "photo":
     #                 media_urls_cleaned.append(m.get("media_url"))
 
-    chunks = []
-    for tweet in tweets:
-        tweet_id = getattr(tweet, "id", None)
-        if not tweet_id:
-            continue
+    # Relevance, sensitivity and missing fields were filtered as pages arrived,
+    # only the username is resolved here
+    kept_tweets = [(tweet, id_to_username_map[tweet.author_id]) for tweet in tweets
+                   if id_to_username_map.get(tweet.author_id)]
 
-        author_id = getattr(tweet, "author_id", None)
-        if not author_id:
-            continue
+    chunking_results = chunk_texts(texts=[tweet.text for tweet, _ in kept_tweets],
+                                   chunk_size=chunk_size,
+                                   chunk_overlap=chunk_overlap,
+                                   encoding_model=encoding_model)
 
-        username = id_to_username_map.get(author_id, None)
-        if not username:
-            continue
+    for (tweet, username), chunking_result in zip(kept_tweets, chunking_results):
+        popularity_score = score_tweet(tweet=tweet)
+        is_cdc_relevant = tweet.relevance_score >= RELEVANCE_THRESHOLD
 
-        tweet_text = getattr(tweet, "text", None)
-        if not tweet_text:
-            continue
+        for i, chunked_text in enumerate(chunking_result):
+            yield {
+                "id": generate_chunk_id(id=tweet.id, text=chunked_text),
+                "text": chunked_text,
+                "chunk_index": i,
+                "created_at": tweet.created_at.isoformat(),
+                "author_id": tweet.author_id,
+                "username": username,
+                "conversation_id": tweet.conversation_id,
+                "source_url": f"https://twitter.com/i/web/status/{tweet.id}",
+                "like_count": tweet.like_count,
+                "retweet_count": tweet.retweet_count,
+                "quote_count": tweet.quote_count,
+                "reply_count": tweet.reply_count,
+                "popularity_score": popularity_score,
+                "relevance_score": tweet.relevance_score,
+                "is_cdc_relevant": is_cdc_relevant,
+                "language": tweet.lang,
+                "ingestion_date": ingestion_date.isoformat()
+                # "hashtags": hashtags_cleaned,
+                # "media_urls": media_urls_cleaned
+            }
+
+# Query for tweets that mention the CDC
+TWEET_QUERY = "(\"CDC\" OR \"Centers for Disease Control\" OR \"Centers for Disease Control and Prevention\" \
+                OR \"@CDCgov\" OR \"#CDC\") -is:retweet -is:quote -is:reply lang:en"
+
+def pull_tweets(twitter_token: str, max_results: int, num_pages: int,
+                start_time: datetime, end_time: datetime, 
+                since_id: Optional[str] = None, num_slices: int = 4, 
+                max_concurrency: int = 4) -> tuple[list[TweetRecord], dict, Optional[tuple], Optional[tuple]]:
+    """Function that pulls (max_results x num_pages) tweets related to the CDC 
+    from the start_time to end_time window, fetching time slices of the window 
+    concurrently and keeping compact records of the relevant ones.
 
-        if not is_about_cdc(tweet_text=tweet_text):
-            continue
+    Parameters:
+        twitter_token (str): The bearer token for tweepy
+        max_results (int): The number of tweets to return per page
+        num_pages (int): The number of tweet pages to return across all slices
+        start_time (datetime): The start of the window, at most 7 days ago
+        end_time (datetime): The end of the window
+        since_id (Optional[str]): Only return tweets newer than this tweet id, 
+            which was created at start_time
+        num_slices (int): The number of time slices to split the window into
+        max_concurrency (int): The number of requests allowed in flight at once
 
-        if getattr(tweet, "possibly_sensitive", False):
-            continue
+    Returns:
+        tuple[list[TweetRecord], dict, Optional[tuple], Optional[tuple]]: The 
+            relevant tweets deduplicated by id, the map of author id to 
+            username, the (id, created_at) of the newest tweet returned, 
+            relevant or not, and of the newest tweet the window was fully 
+            pulled up to, None if the oldest slice was cut short
+    """
+    return asyncio.run(pull_tweets_async(twitter_token=twitter_token,
+                                         max_results=max_results,
+                                         num_pages=num_pages,
+                                         start_time=start_time,
+                                         end_time=end_time,
+                                         since_id=since_id,
+                                         num_slices=num_slices,
+                                         max_concurrency=max_concurrency))
+
+
+async def pull_tweets_async(twitter_token: str, max_results: int, num_pages: int,
+                            start_time: datetime, end_time: datetime, 
+                            since_id: Optional[str], num_slices: int, 
+                            max_concurrency: int) -> tuple[list[TweetRecord], dict, Optional[tuple], Optional[tuple]]:
+    """Function that splits the window into num_slices windows and pages 
+    through them concurrently under a shared page budget and request limit, 
+    handing pages to the oldest slices first so the checkpoint can advance 
+    when the budget runs out.
 
-        metrics = getattr(tweet, "public_metrics", None)
-        if not metrics:
-            continue
+    Parameters:
+        twitter_token (str): The bearer token for tweepy
+        max_results (int): The number of tweets to return per page
+        num_pages (int): The number of tweet pages to return across all slices
+        start_time (datetime): The start of the window
+        end_time (datetime): The end of the window
+        since_id (Optional[str]): Only return tweets newer than this tweet id, 
+            which was created at start_time
+        num_slices (int): The number of time slices to split the window into
+        max_concurrency (int): The number of requests allowed in flight at once
 
-        like_count = metrics.get("like_count", 0) 
-        retweet_count = metrics.get("retweet_count", 0)
-        quote_count = metrics.get("quote_count", 0)
-        reply_count = metrics.get("reply_count", 0)
+    Returns:
+        tuple[list[TweetRecord], dict, Optional[tuple], Optional[tuple]]: The 
+            relevant tweets deduplicated by id, the map of author id to 
+            username, the (id, created_at) of the newest tweet returned, 
+            relevant or not, and of the newest tweet the window was fully 
+            pulled up to, None if the oldest slice was cut short
+    """
+    twitter_client = tweepy.asynchronous.AsyncClient(bearer_token=twitter_token, 
+                                                     wait_on_rate_limit=True)
+
+    num_slices = max(1, min(num_slices, num_pages))
+    slice_length = (end_time - start_time) / num_slices
+
+    # Shared rate-limit budget, pages are claimed one at a time by every slice 
+    # still being pulled, listed under "active" by slice index
+    budget = {"pages": num_pages, "active": set(range(num_slices)), 
+              "condition": asyncio.Condition()}
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    # Slice i ends i slice lengths before end_time, so the oldest slice is the 
+    # last one. Only it takes since_id, which takes precedence over start_time 
+    # in the API and would stretch every slice back to the checkpoint
+    oldest = num_slices - 1
+    # Started oldest first so the first pages go to the oldest slices
+    tasks = {
+        i: asyncio.ensure_future(pull_tweet_slice(
+            twitter_client=twitter_client,
+            slice_index=i,
+            start_time=None if i == oldest and since_id else end_time - slice_length * (i + 1),
+            end_time=end_time - slice_length * i,
+            max_results=max_results,
+            since_id=since_id if i == oldest else None,
+            budget=budget,
+            semaphore=semaphore))
+        for i in reversed(range(num_slices))
+    }
+    # Newest slice first to keep the paginator's newest-first ordering
+    slice_results = await asyncio.gather(*[tasks[i] for i in range(num_slices)])
 
-        chunking_result = chunk_text(text=tweet_text, chunk_size=chunk_size,
-                                           chunk_overlap=chunk_overlap, 
-                                           encoding_model=encoding_model)
+    tweets = []
+    seen_ids = set()
+    id_to_username_map = {}
+    num_returned = 0
+    newest_tweet = None
+    # Newest tweet of the drained slices older than every slice the budget
+    # cut short, the tweets up to it were all returned
+    checkpoint_tweet = None
+    for slice_tweets, slice_users, slice_returned, slice_newest, slice_drained in slice_results:
+        if not slice_drained:
+            checkpoint_tweet = None
+        elif slice_newest is not None and (checkpoint_tweet is None or slice_newest[0] > checkpoint_tweet[0]):
+            checkpoint_tweet = slice_newest
+        id_to_username_map.update(slice_users)
+        num_returned += slice_returned
+        if slice_newest is not None and (newest_tweet is None or slice_newest[0] > newest_tweet[0]):
+            newest_tweet = slice_newest
+        for tweet in slice_tweets:
+            # Drop duplicates returned on both sides of a slice boundary
+            if tweet.id in seen_ids:
+                continue
+            seen_ids.add(tweet.id)
+            tweets.append(tweet)
 
-        for i, chunked_text in enumerate(chunking_result):
-            chunks.append(
-                {
-                    "id": generate_chunk_id(id=tweet_id, text=chunked_text),
-                    "text": chunked_text,
-                    "chunk_index": i,
-                    "created_at": tweet.created_at.isoformat(),
-                    "author_id": author_id,
-                    "username": username,
-                    "conversation_id": getattr(tweet, "conversation_id", None),
-                    "source_url": f"https://twitter.com/i/web/status/{tweet_id}",
-                    "like_count": like_count,
-                    "retweet_count": retweet_count,
-                    "quote_count": quote_count,
-                    "reply_count": reply_count,
-                    "ingestion_date": now.isoformat()
-                    # "hashtags": hashtags_cleaned,
-                    # "media_urls": media_urls_cleaned
-                }
-            )
-    return chunks
-
-def pull_tweets(twitter_token: str, max_results: int, num_pages: int) -> list[any]:
-    """Function that pulls (max_results x num_pages) tweets related to the CDC 
-    from the last 24 hours.
+    logging.info("Kept {} relevant tweets of {} returned from {} slices".format(
+        len(tweets), num_returned, num_slices))
+    num_undrained = sum(1 for *_, slice_drained in slice_results if not slice_drained)
+    if num_undrained:
+        logging.info("Page budget ran out before {} slices were fully pulled, checkpointing "
+                     "at tweet {}".format(num_undrained, checkpoint_tweet and checkpoint_tweet[0]))
+    return tweets, id_to_username_map, newest_tweet, checkpoint_tweet
+
+
+async def claim_page(budget: dict, slice_index: int) -> bool:
+    """Function that takes a page from the shared budget for a slice, waiting 
+    while the pages left are needed in reserve for the older slices still 
+    being pulled.
 
     Parameters:
-        twitter_token (str): The bearer token for tweepy
-        max_results (int): The number of tweets to return per page
-        num_pages (int): The number of tweet pages to return
+        budget (dict): The shared page budget
+        slice_index (int): The index of the slice, higher for older slices
 
     Returns:
-        list[str]: The list of tweets
+        bool: Whether a page was taken, False once the budget ran out
     """
-    twitter_client = tweepy.Client(bearer_token=twitter_token, wait_on_rate_limit=True)
+    async with budget["condition"]:
+        while budget["pages"] > 0:
+            # One page stays in reserve for every older slice, so the oldest 
+            # slice can always take the next page
+            num_older = sum(1 for i in budget["active"] if i > slice_index)
+            if budget["pages"] > num_older:
+                budget["pages"] -= 1
+                return True
+            await budget["condition"].wait()
+    return False
+
+
+async def release_slice(budget: dict, slice_index: int):
+    """Function that marks a slice as no longer pulled, releasing the pages 
+    newer slices held in reserve for it.
+
+    Parameters:
+        budget (dict): The shared page budget
+        slice_index (int): The index of the slice
+    """
+    async with budget["condition"]:
+        budget["active"].discard(slice_index)
+        budget["condition"].notify_all()
 
-    # Logic for current day 
-    start_time = now - timedelta(days=1)
-    end_time = now
-
-    paginator = tweepy.Paginator(
-        twitter_client.search_recent_tweets,
-        query="(\"CDC\" OR \"Centers for Disease Control\" OR \"Centers for Disease Control and Prevention\" \
-                OR \"@CDCgov\" OR \"#CDC\") -is:retweet -is:quote -is:reply lang:en",
-        tweet_fields=["id", "text", "created_at", "author_id", 
-                      "possibly_sensitive", "conversation_id", "public_metrics"], 
-        expansions=["author_id"],
-        user_fields=["username"],
-        start_time=start_time.isoformat(),
-        end_time=end_time.isoformat(), 
-        max_results=max_results
-    )
 
+async def pull_tweet_slice(twitter_client: tweepy.asynchronous.AsyncClient, 
+                           slice_index: int, start_time: Optional[datetime], 
+                           end_time: datetime, max_results: int, 
+                           since_id: Optional[str], budget: dict, 
+                           semaphore: asyncio.Semaphore) -> tuple[list[TweetRecord], dict, int, Optional[tuple], bool]:
+    """Function that pages through the tweets of one time slice until the slice 
+    is exhausted or the shared page budget runs out, converting each page to 
+    compact records of its relevant tweets as it arrives.
+
+    Parameters:
+        twitter_client (tweepy.asynchronous.AsyncClient): The async client
+        slice_index (int): The index of the slice, higher for older slices
+        start_time (Optional[datetime]): The inclusive start of the slice, None 
+            when it starts after since_id
+        end_time (datetime): The exclusive end of the slice
+        max_results (int): The number of tweets to return per page
+        since_id (Optional[str]): Only return tweets newer than this tweet id
+        budget (dict): The shared page budget, see claim_page
+        semaphore (asyncio.Semaphore): The shared limit on requests in flight
+
+    Returns:
+        tuple[list[TweetRecord], dict, int, Optional[tuple], bool]: The slice's 
+            relevant tweets, map of author id to username, number of tweets 
+            returned, (id, created_at) of its newest tweet and whether every 
+            page of the slice was returned
+    """
     tweets = []
     id_to_username_map = {}
-    for i, page in enumerate(paginator):
-        if i >= num_pages:
-            break
-
-        if not page.data:
-            continue
-        users = page.includes.get("users", []) if hasattr(page, "includes") else []
-        for user in users:
-            username = getattr(user, "username", None)
-            if not username:
-                print("No username")
-                continue
-            user_id = getattr(user, "id", None)
-            if not user_id:
-                print("No id")
-                continue
-            id_to_username_map[user_id] = username
-        tweets.extend(page.data)
-        print(len(tweets))
+    num_returned = 0
+    newest_tweet = None
+    next_token = None
+    drained = False
+    try:
+        while await claim_page(budget=budget, slice_index=slice_index):
+            async with semaphore:
+                page = await twitter_client.search_recent_tweets(
+                    query=TWEET_QUERY,
+                    tweet_fields=["id", "text", "created_at", "author_id", "lang", 
+                                  "possibly_sensitive", "conversation_id", "public_metrics"], 
+                    expansions=["author_id"],
+                    user_fields=["username"],
+                    start_time=start_time.isoformat() if start_time else None,
+                    end_time=end_time.isoformat(), 
+                    max_results=max_results,
+                    since_id=since_id,
+                    next_token=next_token
+                )
+
+            if page.data:
+                users = page.includes.get("users", []) if page.includes else []
+                for user in users:
+                    username = getattr(user, "username", None)
+                    user_id = getattr(user, "id", None)
+                    if not username or not user_id:
+                        continue
+                    id_to_username_map[user_id] = username
+
+                num_returned += len(page.data)
+                for tweet in page.data:
+                    if newest_tweet is None or tweet.id > newest_tweet[0]:
+                        newest_tweet = (tweet.id, tweet.created_at)
+                    record = to_relevant_record(tweet=tweet)
+                    if record is not None:
+                        tweets.append(record)
+
+            next_token = page.meta.get("next_token") if page.meta else None
+            if not next_token:
+                drained = True
+                break
+    finally:
+        await release_slice(budget=budget, slice_index=slice_index)
+
+    return tweets, id_to_username_map, num_returned, newest_tweet, drained
+
+
+def to_relevant_record(tweet: any) -> Optional[TweetRecord]:
+    """Function that converts a tweet to a compact record if it is complete, 
+    not sensitive and about the CDC.
+
+    Parameters:
+        tweet (any): The tweet object returned by twitter_client
+
+    Returns:
+        Optional[TweetRecord]: The record or None if the tweet is filtered out
+    """
+    if not getattr(tweet, "id", None) or not getattr(tweet, "author_id", None):
+        return None
+
+    tweet_text = getattr(tweet, "text", None)
+    if not tweet_text:
+        return None
+
+    if getattr(tweet, "possibly_sensitive", False):
+        return None
+
+    if not getattr(tweet, "public_metrics", None):
+        return None
+
+    # Scores 0 for tweets not about the CDC or matching a negative term
+    relevance_score = score_relevance(tweet_text=tweet_text)
+    if relevance_score <= 0:
+        return None
 
-    print("Pulled tweets")
-    return tweets, id_to_username_map
+    return TweetRecord.from_tweet(tweet=tweet, relevance_score=relevance_score)
 
 
 def score_tweet(tweet: any) -> int:
@@ -3,7 +3,128 @@ from langchain_core.documents import Document
 import tiktoken
 import hashlib
 
-def chunk_text(text: str, chunk_size: int, chunk_overlap: int, 
+# Registries of encoders keyed by encoding_model and chunkers keyed by
+# (encoding_model, chunk_size, chunk_overlap) so the encoder and splitter are
+# built once per process instead of once per tweet
+_encoders = {}
+_chunkers = {}
+
+
+class TweetChunker:
+    """Holds the tiktoken encoder and text splitter for a single
+    (encoding_model, chunk_size, chunk_overlap) configuration.
+
+    Parameters:
+        encoding_model (str): The name of model used to compute number of tokens
+        chunk_size (int): The number of tokens per chunk
+        chunk_overlap (int): The number of token overlap between chunks
+    """
+    def __init__(self, encoding_model: str, chunk_size: int, chunk_overlap: int):
+        self.encoding_model = encoding_model
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.encoder = get_encoder(encoding_model)
+        self.splitter = RecursiveCharacterTextSplitter(
+            # Optimize chunk size and overlap
+            separators=["\n\n", "\n", ".", " ", ""],
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=self.count_tokens
+            )
+
+    def count_tokens(self, text: str) -> int:
+        """Function to count the number of tokens in text with the cached
+        encoder.
+
+        Parameters:
+            text (str): The input string
+
+        Returns:
+            int: number of expected tokens to embed text
+        """
+        return len(self.encoder.encode(text=text))
+
+    def chunk(self, text: str) -> list[str]:
+        """Function to produce list of chunks from input text, skipping the
+        splitter when the text already fits in a single chunk.
+
+        Parameters:
+            text (str): input text from tweet (None checks in main)
+
+        Returns:
+            list[str]: The array of chunks corresponding to the input text
+        """
+        # Fast path, almost every tweet fits in one chunk
+        if self.count_tokens(text) <= self.chunk_size:
+            stripped = text.strip()
+            return [stripped] if stripped else []
+
+        return self.split(text)
+
+    def chunk_batch(self, texts: list[str], num_threads: int = 8) -> list[list[str]]:
+        """Function to produce the chunks for many texts at once, counting
+        tokens for every text in a single multithreaded encode_batch pass and
+        only sending over-length texts through the splitter.
+
+        Parameters:
+            texts (list[str]): input texts from tweets (None checks in main)
+            num_threads (int): The number of threads tiktoken encodes with
+
+        Returns:
+            list[list[str]]: The array of chunks for each input text, in the
+                same order as texts
+        """
+        token_lists = self.encoder.encode_batch(texts, num_threads=num_threads)
+
+        chunk_lists = []
+        for text, tokens in zip(texts, token_lists):
+            if len(tokens) <= self.chunk_size:
+                stripped = text.strip()
+                chunk_lists.append([stripped] if stripped else [])
+            else:
+                chunk_lists.append(self.split(text))
+        return chunk_lists
+
+    def split(self, text: str) -> list[str]:
+        """Function to split an over-length text with the recursive splitter.
+
+        Parameters:
+            text (str): input text from tweet
+
+        Returns:
+            list[str]: The array of chunks corresponding to the input text
+        """
+        chunk_list = []
+        documents = self.splitter.create_documents([text])
+        for doc in documents:
+            chunk_list.append(doc.page_content)
+        return chunk_list
+
+
+def get_chunker(encoding_model: str, chunk_size: int,
+                chunk_overlap: int) -> TweetChunker:
+    """Function to get the cached chunker for a configuration, building it on
+    first use.
+
+    Parameters:
+        encoding_model (str): The name of model used to compute number of tokens
+        chunk_size (int): The number of tokens per chunk
+        chunk_overlap (int): The number of token overlap between chunks
+
+    Returns:
+        TweetChunker: The chunker shared by every call with this configuration
+    """
+    key = (encoding_model, chunk_size, chunk_overlap)
+    chunker = _chunkers.get(key)
+    if chunker is None:
+        chunker = TweetChunker(encoding_model=encoding_model,
+                               chunk_size=chunk_size,
+                               chunk_overlap=chunk_overlap)
+        _chunkers[key] = chunker
+    return chunker
+
+
+def chunk_text(text: str, chunk_size: int, chunk_overlap: int,
                      encoding_model: str) -> list[str]:
     """Function to produce list of chunks from input text.
 
@@ -16,36 +137,63 @@ def chunk_text(text: str, chunk_size: int, chunk_overlap: int,
     Returns:
         list[str]: The array of chunks corresponding to the input text
     """
+    chunker = get_chunker(encoding_model=encoding_model, chunk_size=chunk_size,
+                          chunk_overlap=chunk_overlap)
+    return chunker.chunk(text)
+
+def chunk_texts(texts: list[str], chunk_size: int, chunk_overlap: int,
+                encoding_model: str) -> list[list[str]]:
+    """Function to produce the list of chunks for each input text in one
+    batch.
+
+    Parameters:
+        texts (list[str]): input texts from tweets (None checks in main)
+        chunk_size (int): The number of tokens per chunk
+        chunk_overlap (int): The number of token overlap between chunks
+        encoding_model (str): The name of model used to compute number of tokens
 
-    splitter = RecursiveCharacterTextSplitter(
-        # Optimize chunk size and overlap
-        separators=["\n\n", "\n", ".", " ", ""], 
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap, 
-        length_function=lambda t: count_tokens(t, encoding_model)
-        )
+    Returns:
+        list[list[str]]: The array of chunks for each input text, in the same
+            order as texts
+    """
+    if not texts:
+        return []
 
-    chunk_list = []
-    documents = splitter.create_documents([text])
-    for doc in documents:
-        chunk_list.append(doc.page_content)
-    return chunk_list
+    chunker = get_chunker(encoding_model=encoding_model, chunk_size=chunk_size,
+                          chunk_overlap=chunk_overlap)
+    return chunker.chunk_batch(texts)
 
 def count_tokens(text: str, encoding_model: str) -> int:
     """Function to count the expected number of tokens necessary to embed the
-    input text. 
+    input text.
 
     Parameters:
         text (str): The input string
         encoding_model (str): The name of the encoding model to compute tokens
-    
+
     Returns:
         int: number of expected tokens to embed text
     """
 
-    tokenizer = tiktoken.encoding_for_model(encoding_model)
+    tokenizer = get_encoder(encoding_model)
     return len(tokenizer.encode(text=text))
 
+def get_encoder(encoding_model: str) -> tiktoken.Encoding:
+    """Function to get the tiktoken encoder for a model, cached for the
+    lifetime of the process.
+
+    Parameters:
+        encoding_model (str): The name of the encoding model to compute tokens
+
+    Returns:
+        tiktoken.Encoding: The encoder for the model
+    """
+    encoder = _encoders.get(encoding_model)
+    if encoder is None:
+        encoder = tiktoken.encoding_for_model(encoding_model)
+        _encoders[encoding_model] = encoder
+    return encoder
+
 def generate_chunk_id(id: int, text: str) -> str:
     """Function to generate unique chunk id that encodes changes and
     information about the input text.
@@ -58,4 +206,16 @@ def generate_chunk_id(id: int, text: str) -> str:
         - str: unique id using hash to compute 10 digit encoding of text
     """
 
-    return "{}-{}".format(id, hashlib.sha256(text.encode()).hexdigest()[:10])
\ No newline at end of file
+    return "{}-{}".format(id, hash_text(text)[:10])
+
+def hash_text(text: str) -> str:
+    """Function to compute the sha256 content hash of a text, shared by chunk
+    ids and the embedding cache.
+
+    Parameters:
+        text (str): The input string
+
+    Returns:
+        str: The hex digest of the text
+    """
+    return hashlib.sha256(text.encode()).hexdigest()
@@ -0,0 +1,174 @@
+import base64
+import json
+import logging
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from itertools import islice
+from typing import Iterable, Iterator, Optional
+from azure.core.exceptions import ResourceNotFoundError
+from azure.storage.blob import BlobClient
+from openai import AzureOpenAI
+from .chunking import hash_text
+from .storage import SKIP_INDEXING_METADATA
+
+# Blob path of the embedding cache, kept next to the checkpoint
+EMBEDDING_CACHE_BLOB_PATH = "cdc-embedding-cache.json"
+
+
+class EmbeddingCache:
+    """Persistent map of chunk text sha256 to embedding vector, bucketed by
+    the day each vector was last used so vectors nobody reuses expire after
+    retention_days.
+
+    Vectors are stored as base64 float32 bytes, about a third of the size of
+    the same vector as a JSON list of floats.
+
+    Parameters:
+        buckets (dict[str, dict[str, str]]): Encoded vectors by text hash,
+            keyed by ISO date
+        retention_days (int): The number of days an unused vector is kept
+    """
+    def __init__(self, buckets: dict[str, dict[str, str]], retention_days: int):
+        self.buckets = buckets
+        self.retention_days = retention_days
+        self._vectors = {}
+        # Older buckets first so a vector's latest use wins
+        for day in sorted(buckets):
+            self._vectors.update(buckets[day])
+        self._used = set()
+
+    @classmethod
+    def load(cls, blob_client: BlobClient, retention_days: int = 3) -> "EmbeddingCache":
+        """Function that reads the embedding cache from storage.
+
+        Parameters:
+            blob_client (BlobClient): The client for the embedding cache blob
+            retention_days (int): The number of days an unused vector is kept
+
+        Returns:
+            EmbeddingCache: The cache, empty on the first run
+        """
+        try:
+            data = blob_client.download_blob().readall()
+        except ResourceNotFoundError:
+            return cls(buckets={}, retention_days=retention_days)
+        return cls(buckets=json.loads(data), retention_days=retention_days)
+
+    def __len__(self) -> int:
+        return len(self._vectors)
+
+    def get(self, text_hash: str) -> Optional[list[float]]:
+        encoded = self._vectors.get(text_hash)
+        if encoded is None:
+            return None
+        self._used.add(text_hash)
+        return array("f", base64.b64decode(encoded)).tolist()
+
+    def put(self, text_hash: str, vector: list[float]) -> None:
+        self._vectors[text_hash] = base64.b64encode(array("f", vector).tobytes()).decode()
+        self._used.add(text_hash)
+
+    def save(self, blob_client: BlobClient, today: date) -> None:
+        """Function that moves the vectors used by this run under today's
+        bucket, expires buckets older than retention_days and writes the
+        result to storage.
+
+        Parameters:
+            blob_client (BlobClient): The client for the embedding cache blob
+            today (date): The date of this run
+
+        Returns:
+            None
+        """
+        key = today.isoformat()
+        for day, vectors in self.buckets.items():
+            if day != key:
+                self.buckets[day] = {text_hash: encoded for text_hash, encoded in vectors.items()
+                                     if text_hash not in self._used}
+        today_bucket = self.buckets.setdefault(key, {})
+        for text_hash in self._used:
+            today_bucket[text_hash] = self._vectors[text_hash]
+        self._used = set()
+
+        # ISO dates sort lexically so old buckets can be compared as strings
+        cutoff = (today - timedelta(days=self.retention_days)).isoformat()
+        self.buckets = {day: vectors for day, vectors in self.buckets.items() if day > cutoff}
+        self._vectors = {}
+        for day in sorted(self.buckets):
+            self._vectors.update(self.buckets[day])
+
+        blob_client.upload_blob(json.dumps(self.buckets, separators=(",", ":")),
+                                overwrite=True, metadata=SKIP_INDEXING_METADATA)
+
+
+def embed_chunks(chunks: Iterable[dict], openai_client: AzureOpenAI,
+                 deployment: str, cache: EmbeddingCache, dimensions: int,
+                 batch_size: int = 256, max_concurrency: int = 4) -> Iterator[dict]:
+    """Function that sets the text_vector field of every chunk, reusing cached
+    vectors for texts embedded before and embedding the rest in batches, so
+    the indexer does not need to run the embedding skill. Chunks are read in
+    windows of batch_size x max_concurrency, so only one window of chunks
+    and vectors is held at a time.
+
+    Parameters:
+        chunks (Iterable[dict]): The chunks to embed
+        openai_client (AzureOpenAI): The client for the embeddings deployment
+        deployment (str): The name of the embeddings deployment
+        cache (EmbeddingCache): The content hash keyed vector cache
+        dimensions (int): The number of dimensions of the index vector field
+        batch_size (int): The number of texts sent in one embeddings request
+        max_concurrency (int): The number of embeddings requests in flight at once
+
+    Returns:
+        Iterator[dict]: The chunks with text_vector set, in input order
+    """
+    def embed_batch(batch: list[tuple[str, str]]) -> list[tuple[str, list[float]]]:
+        response = openai_client.embeddings.create(model=deployment,
+                                                   input=[text for _, text in batch],
+                                                   dimensions=dimensions)
+        # Results carry the index of their input, do not rely on their order
+        embeddings = sorted(response.data, key=lambda item: item.index)
+        return [(text_hash, item.embedding) for (text_hash, _), item in zip(batch, embeddings)]
+
+    chunks = iter(chunks)
+    num_chunks, num_cached, num_new, num_requests = 0, 0, 0, 0
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        while True:
+            window = list(islice(chunks, batch_size * max_concurrency))
+            if not window:
+                break
+
+            # Identical texts, such as the same headline posted by many
+            # accounts, are embedded once
+            texts_by_hash = {}
+            vectors = {}
+            for chunk in window:
+                text_hash = hash_text(chunk["text"])
+                if text_hash in vectors or text_hash in texts_by_hash:
+                    continue
+                vector = cache.get(text_hash)
+                if vector is not None:
+                    vectors[text_hash] = vector
+                else:
+                    texts_by_hash[text_hash] = chunk["text"]
+
+            missing = list(texts_by_hash.items())
+            batches = [missing[i:i + batch_size] for i in range(0, len(missing), batch_size)]
+            for results in executor.map(embed_batch, batches):
+                for text_hash, vector in results:
+                    # Later windows find repeated texts in the cache
+                    cache.put(text_hash, vector)
+                    vectors[text_hash] = vector
+
+            num_chunks += len(window)
+            num_cached += len(vectors) - len(missing)
+            num_new += len(missing)
+            num_requests += len(batches)
+
+            for chunk in window:
+                chunk["text_vector"] = vectors[hash_text(chunk["text"])]
+                yield chunk
+
+    logging.info("Embedded {} chunks with {} cached and {} new vectors in {} requests"
+                 .format(num_chunks, num_cached, num_new, num_requests))
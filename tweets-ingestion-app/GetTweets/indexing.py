@@ -0,0 +1,218 @@
+import json
+import logging
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterable, Iterator
+from azure.core.exceptions import HttpResponseError
+from azure.search.documents import SearchClient
+
+# Index fields set by ingestion, the other enrichment fields are left to the
+# indexer. The language comes from Twitter so chat's language filter matches
+# pushed documents before the indexer detects it
+INDEX_FIELDS = ["id", "text", "chunk_index", "created_at", "author_id", "username",
+                "conversation_id", "source_url", "like_count", "retweet_count",
+                "quote_count", "reply_count", "popularity_score", "relevance_score",
+                "is_cdc_relevant", "duplicate_count", "cluster_popularity_score",
+                "language", "text_vector"]
+
+# Edm.String fields that hold ids, which the indexer used to convert from numbers
+STRING_ID_FIELDS = ["author_id", "conversation_id"]
+
+# Payload size of each indexing request, well under the 16 MB request limit
+MAX_BATCH_BYTES = 4 * 1024 * 1024
+
+# Number of documents the service accepts in one indexing request
+MAX_BATCH_SIZE = 1000
+
+# Status codes of documents that may succeed when sent again
+RETRYABLE_STATUS_CODES = {409, 422, 503}
+
+# Status codes of whole requests that may succeed when their documents are
+# sent again one at a time, for payloads too large or throttled requests
+RETRYABLE_REQUEST_STATUS_CODES = {413, 429, 503}
+
+_json_encoder = json.JSONEncoder(separators=(",", ":"))
+
+
+def to_index_document(chunk: dict) -> dict:
+    """Function that projects a chunk onto the index schema, since pushed
+    documents skip the indexer field mappings and are rejected for unknown
+    fields or mismatched types.
+
+    Parameters:
+        chunk (dict): The chunk
+
+    Returns:
+        dict: The index document
+    """
+    document = {field: chunk[field] for field in INDEX_FIELDS if field in chunk}
+    for field in STRING_ID_FIELDS:
+        if document.get(field) is not None:
+            document[field] = str(document[field])
+    return document
+
+
+def batch_documents(documents: Iterable[dict], max_batch_bytes: int = MAX_BATCH_BYTES,
+                    max_batch_size: int = MAX_BATCH_SIZE) -> Iterator[list[dict]]:
+    """Function that groups documents into batches of at most max_batch_bytes
+    of JSON, so batches of chunks with vectors are not rejected for size while
+    batches without vectors still carry many documents.
+
+    Parameters:
+        documents (Iterable[dict]): The documents to batch
+        max_batch_bytes (int): The number of payload bytes per batch
+        max_batch_size (int): The number of documents per batch
+
+    Returns:
+        Iterator[list[dict]]: The batches, in document order
+    """
+    batch, batch_bytes = [], 0
+    for document in documents:
+        document_bytes = len(_json_encoder.encode(document).encode())
+        if batch and (batch_bytes + document_bytes > max_batch_bytes
+                      or len(batch) >= max_batch_size):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(document)
+        batch_bytes += document_bytes
+    if batch:
+        yield batch
+
+
+def push_chunks(search_client: SearchClient, chunks: Iterable[dict],
+                max_batch_bytes: int = MAX_BATCH_BYTES, max_concurrency: int = 4,
+                max_retries: int = 3, merge_only: bool = False) -> Iterator[dict]:
+    """Function that pushes chunks straight to the search index in parallel
+    batches so they are searchable without waiting for the indexer, yielding
+    each chunk once it is queued so the caller can write it to storage in
+    the same pass. At most max_concurrency batches are in flight, the next
+    batch is only read once one of them finishes. Documents that fail with a
+    retryable status, or whose request was too large or throttled, are sent 
+    again one at a time. Other failed requests fail their batch at once.
+
+    Documents are merged rather than replaced so the enrichment fields the
+    indexer adds are kept. With merge_only, documents that are not in the 
+    index are skipped instead of uploaded.
+
+    Parameters:
+        search_client (SearchClient): The client for the search index
+        chunks (Iterable[dict]): The chunks to push
+        max_batch_bytes (int): The number of payload bytes per request
+        max_concurrency (int): The number of indexing requests in flight at once
+        max_retries (int): The number of times a failed document is sent
+        merge_only (bool): Whether to only update documents already indexed
+
+    Returns:
+        Iterator[dict]: The chunks, in input order
+    """
+    if merge_only:
+        index_documents = search_client.merge_documents
+    else:
+        index_documents = search_client.merge_or_upload_documents
+
+    def is_missing(result: any) -> bool:
+        # Merges into documents that are not indexed fail with 404
+        return merge_only and result.status_code == 404
+
+    def push_document(document: dict) -> bool:
+        for attempt in range(max_retries):
+            if attempt:
+                time.sleep(2 ** attempt)
+            try:
+                result = index_documents(documents=[document])[0]
+            except HttpResponseError as e:
+                logging.info("Error pushing document {}: {}".format(document["id"], e.message))
+                if e.status_code in RETRYABLE_REQUEST_STATUS_CODES:
+                    continue
+                break
+            if result.succeeded or is_missing(result):
+                return True
+            if result.status_code not in RETRYABLE_STATUS_CODES:
+                break
+        return False
+
+    def push_batch(batch: list[dict]) -> tuple[int, list[str], int]:
+        num_missing = 0
+        try:
+            results = index_documents(documents=batch)
+            num_missing = sum(1 for result in results if is_missing(result))
+            failed_keys = {result.key for result in results if not result.succeeded
+                           and result.status_code in RETRYABLE_STATUS_CODES}
+            rejected = [result.key for result in results if not result.succeeded
+                        and result.status_code not in RETRYABLE_STATUS_CODES
+                        and not is_missing(result)]
+        except HttpResponseError as e:
+            if e.status_code not in RETRYABLE_REQUEST_STATUS_CODES:
+                # Sending the documents again would fail the same way
+                logging.error("Error pushing batch of {} documents: {}".format(len(batch),
+                                                                              e.message))
+                return 0, [document["id"] for document in batch], 0
+            # The request was too large or throttled, retry every document on its own
+            logging.info("Error pushing batch of {} documents: {}".format(len(batch), e.message))
+            failed_keys, rejected = {document["id"] for document in batch}, []
+
+        retried = [document for document in batch if document["id"] in failed_keys]
+        failed = rejected + [document["id"] for document in retried
+                             if not push_document(document)]
+        return len(batch) - len(failed) - num_missing, failed, num_missing
+
+    num_batches, num_indexed, num_failed, num_skipped = 0, 0, 0, 0
+
+    def report(future: Future) -> None:
+        nonlocal num_batches, num_indexed, num_failed, num_skipped
+        succeeded, failed, skipped = future.result()
+        num_batches += 1
+        num_indexed += succeeded
+        num_failed += len(failed)
+        num_skipped += skipped
+        logging.info("Pushed batch {}: {} indexed, {} failed, {} not in the index".format(
+            num_batches, succeeded, len(failed), skipped))
+        if failed:
+            logging.info("Failed to push documents {}".format(failed))
+
+    # Chunks read by the batcher and not yet handed back to the caller
+    queued = deque()
+
+    def documents() -> Iterator[dict]:
+        for chunk in chunks:
+            queued.append(chunk)
+            yield to_index_document(chunk)
+
+    in_flight = deque()
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        for batch in batch_documents(documents=documents(), max_batch_bytes=max_batch_bytes):
+            if len(in_flight) >= max_concurrency:
+                report(in_flight.popleft())
+            in_flight.append(executor.submit(push_batch, batch))
+            while queued:
+                yield queued.popleft()
+
+        while queued:
+            yield queued.popleft()
+        while in_flight:
+            report(in_flight.popleft())
+
+    logging.info("Pushed {} documents in {} batches, {} failed, {} not in the index".format(
+        num_indexed, num_batches, num_failed, num_skipped))
+
+
+def push_documents(search_client: SearchClient, documents: Iterable[dict],
+                   max_batch_bytes: int = MAX_BATCH_BYTES, max_concurrency: int = 4) -> None:
+    """Function that merges partial documents into the ones already in the
+    search index and waits for them. Documents that are not indexed are
+    skipped, so no document holding only the partial fields is created.
+
+    Parameters:
+        search_client (SearchClient): The client for the search index
+        documents (Iterable[dict]): The documents to push
+        max_batch_bytes (int): The number of payload bytes per request
+        max_concurrency (int): The number of indexing requests in flight at once
+
+    Returns:
+        None
+    """
+    for _ in push_chunks(search_client=search_client, chunks=documents,
+                         max_batch_bytes=max_batch_bytes, max_concurrency=max_concurrency,
+                         merge_only=True):
+        pass
@@ -0,0 +1,199 @@
+import hashlib
+import json
+import logging
+import re
+from datetime import date, timedelta
+from typing import Iterable, Iterator, Optional
+from azure.core.exceptions import ResourceNotFoundError
+from azure.storage.blob import BlobClient
+from .storage import SKIP_INDEXING_METADATA
+
+# Blob path of the recent cluster representatives, kept next to the checkpoint
+NEAR_DUPLICATES_BLOB_PATH = "cdc-near-duplicates.json"
+
+# Number of bits in a fingerprint and the LSH bands it is split into. Texts
+# within MAX_DISTANCE bits share at least one band when MAX_DISTANCE < NUM_BANDS.
+# Reposts of a headline measure 4 to 6 bits apart, unrelated tweets over 25
+FINGERPRINT_BITS = 64
+NUM_BANDS = 8
+MAX_DISTANCE = 6
+
+_BAND_BITS = FINGERPRINT_BITS // NUM_BANDS
+_BAND_MASK = (1 << _BAND_BITS) - 1
+
+
+def simhash(text: str) -> int:
+    """Function that computes the 64 bit SimHash of a text over its words,
+    ignoring case, links, mentions and the retweet prefix so copies of the
+    same headline get fingerprints a few bits apart.
+
+    Parameters:
+        text (str): The input string
+
+    Returns:
+        int: The fingerprint
+    """
+    text = re.sub(r"^RT @\w+:", "", text.strip())
+    text = re.sub(r"https?://\S+|@\w+", "", text.lower())
+
+    weights = [0] * FINGERPRINT_BITS
+    for word in set(re.findall(r"\w+", text)):
+        word_hash = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), "big")
+        for bit in range(FINGERPRINT_BITS):
+            weights[bit] += 1 if word_hash >> bit & 1 else -1
+
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+class NearDuplicateIndex:
+    """Clusters near-identical chunk texts by SimHash within a run and against
+    the representatives of recent runs. Chunks only join a cluster of tweets
+    posted the same UTC day, so a cluster's weight is counted on the day its
+    copies were posted. Clusters are bucketed by that day and expire after
+    retention_days so memory stays bounded.
+
+    Parameters:
+        buckets (dict[str, dict[str, list]]): [fingerprint, duplicate_count,
+            cluster_popularity_score] keyed by representative chunk id, keyed
+            by ISO date
+        retention_days (int): The number of days a cluster is remembered
+    """
+    def __init__(self, buckets: dict[str, dict[str, list]], retention_days: int):
+        self.buckets = buckets
+        self.retention_days = retention_days
+        self._clusters = {}
+        self._bands = {}
+        for day, clusters in buckets.items():
+            for chunk_id, (fingerprint, duplicate_count, popularity_score) in clusters.items():
+                self._add(chunk_id=chunk_id, day=day, fingerprint=int(fingerprint, 16),
+                          duplicate_count=duplicate_count, popularity_score=popularity_score)
+        self._grown = set()
+
+    @classmethod
+    def load(cls, blob_client: BlobClient, retention_days: int = 3) -> "NearDuplicateIndex":
+        """Function that reads the recent clusters from storage.
+
+        Parameters:
+            blob_client (BlobClient): The client for the near duplicates blob
+            retention_days (int): The number of days a cluster is remembered
+
+        Returns:
+            NearDuplicateIndex: The index, empty on the first run
+        """
+        try:
+            data = blob_client.download_blob().readall()
+        except ResourceNotFoundError:
+            return cls(buckets={}, retention_days=retention_days)
+        return cls(buckets=json.loads(data), retention_days=retention_days)
+
+    def __len__(self) -> int:
+        return len(self._clusters)
+
+    def _band_keys(self, day: str, fingerprint: int) -> Iterator[tuple]:
+        for band in range(NUM_BANDS):
+            yield (day, band, fingerprint >> (band * _BAND_BITS) & _BAND_MASK)
+
+    def _add(self, chunk_id: str, day: str, fingerprint: int, duplicate_count: int,
+             popularity_score: float) -> None:
+        self._clusters[chunk_id] = [day, fingerprint, duplicate_count, popularity_score]
+        for key in self._band_keys(day=day, fingerprint=fingerprint):
+            self._bands.setdefault(key, []).append(chunk_id)
+
+    def find(self, day: str, fingerprint: int) -> Optional[str]:
+        """Function that finds the representative of a cluster of the given day
+        within MAX_DISTANCE bits of a fingerprint, only comparing against
+        candidates sharing a band.
+
+        Parameters:
+            day (str): The ISO date the tweet was posted
+            fingerprint (int): The fingerprint to look up
+
+        Returns:
+            Optional[str]: The representative chunk id or None
+        """
+        for key in self._band_keys(day=day, fingerprint=fingerprint):
+            for chunk_id in self._bands.get(key, []):
+                other = self._clusters[chunk_id][1]
+                if bin(fingerprint ^ other).count("1") <= MAX_DISTANCE:
+                    return chunk_id
+        return None
+
+    def collapse(self, chunks: Iterable[dict]) -> Iterator[dict]:
+        """Function that yields the chunks that start a new cluster and counts
+        the other chunks into the cluster they nearly duplicate. The yielded
+        chunks keep their own engagement, the cluster totals are reported by
+        cluster_updates once the chunks are consumed.
+
+        Parameters:
+            chunks (Iterable[dict]): The new chunks
+
+        Returns:
+            Iterator[dict]: The new representatives, in input order
+        """
+        num_chunks, num_clusters = 0, 0
+        for chunk in chunks:
+            num_chunks += 1
+            # created_at is an ISO timestamp in UTC
+            day = chunk["created_at"][:10]
+            fingerprint = simhash(chunk["text"])
+            popularity_score = chunk.get("popularity_score") or 0
+            chunk_id = self.find(day=day, fingerprint=fingerprint)
+            if chunk_id is None:
+                num_clusters += 1
+                self._add(chunk_id=chunk["id"], day=day, fingerprint=fingerprint,
+                          duplicate_count=1, popularity_score=popularity_score)
+                yield chunk
+            else:
+                cluster = self._clusters[chunk_id]
+                cluster[2] += 1
+                cluster[3] += popularity_score
+                self._grown.add(chunk_id)
+        logging.info("Collapsed {} new chunks into {} new clusters, {} clusters grew"
+                     .format(num_chunks, num_clusters, len(self._grown)))
+
+    def cluster_updates(self) -> list[dict]:
+        """Function that returns the partial index documents of the clusters
+        that grew in this run, to be merged into their representatives.
+
+        Returns:
+            list[dict]: The documents with id, duplicate_count and
+                cluster_popularity_score
+        """
+        return [{"id": chunk_id,
+                 "duplicate_count": self._clusters[chunk_id][2],
+                 "cluster_popularity_score": self._clusters[chunk_id][3]}
+                for chunk_id in self._grown]
+
+    def save(self, blob_client: BlobClient, today: date) -> None:
+        """Function that expires the clusters of days older than
+        retention_days and writes the rest to storage.
+
+        Parameters:
+            blob_client (BlobClient): The client for the near duplicates blob
+            today (date): The date of this run
+
+        Returns:
+            None
+        """
+        # ISO dates sort lexically so old days can be compared as strings
+        cutoff = (today - timedelta(days=self.retention_days)).isoformat()
+        self.buckets = {}
+        for chunk_id, (day, fingerprint, duplicate_count, popularity_score) in self._clusters.items():
+            if day > cutoff:
+                self.buckets.setdefault(day, {})[chunk_id] = [
+                    "{:016x}".format(fingerprint), duplicate_count, popularity_score]
+        self._grown = set()
+
+        self._clusters = {}
+        self._bands = {}
+        for day, clusters in self.buckets.items():
+            for chunk_id, (fingerprint, duplicate_count, popularity_score) in clusters.items():
+                self._add(chunk_id=chunk_id, day=day, fingerprint=int(fingerprint, 16),
+                          duplicate_count=duplicate_count, popularity_score=popularity_score)
+
+        blob_client.upload_blob(json.dumps(self.buckets, separators=(",", ":")),
+                                overwrite=True, metadata=SKIP_INDEXING_METADATA)
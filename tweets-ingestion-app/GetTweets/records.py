@@ -0,0 +1,73 @@
+from datetime import datetime
+from typing import Optional
+
+
+class TweetRecord:
+    """Compact record of the tweet fields ingestion reads, built from each
+    page as it arrives so the full tweepy objects and their raw payloads are
+    not kept for the whole run.
+
+    Parameters:
+        id (int): The tweet id
+        text (str): The tweet text
+        created_at (datetime): The time the tweet was posted
+        author_id (int): The id of the author
+        lang (Optional[str]): The language Twitter detected for the text
+        conversation_id (Optional[int]): The id of the conversation
+        like_count (int): The number of likes
+        retweet_count (int): The number of retweets
+        quote_count (int): The number of quotes
+        reply_count (int): The number of replies
+        relevance_score (float): The CDC relevance score of the text
+    """
+    __slots__ = ("id", "text", "created_at", "author_id", "lang", "conversation_id",
+                 "like_count", "retweet_count", "quote_count", "reply_count",
+                 "relevance_score")
+
+    def __init__(self, id: int, text: str, created_at: datetime, author_id: int,
+                 lang: Optional[str], conversation_id: Optional[int], like_count: int,
+                 retweet_count: int, quote_count: int, reply_count: int,
+                 relevance_score: float):
+        self.id = id
+        self.text = text
+        self.created_at = created_at
+        self.author_id = author_id
+        self.lang = lang
+        self.conversation_id = conversation_id
+        self.like_count = like_count
+        self.retweet_count = retweet_count
+        self.quote_count = quote_count
+        self.reply_count = reply_count
+        self.relevance_score = relevance_score
+
+    @classmethod
+    def from_tweet(cls, tweet: any, relevance_score: float) -> "TweetRecord":
+        """Function that copies the fields ingestion reads out of a tweet.
+
+        Parameters:
+            tweet (any): The tweet object returned by twitter_client
+            relevance_score (float): The CDC relevance score of the text
+
+        Returns:
+            TweetRecord: The compact record
+        """
+        metrics = tweet.public_metrics
+        return cls(id=tweet.id,
+                   text=tweet.text,
+                   created_at=tweet.created_at,
+                   author_id=tweet.author_id,
+                   lang=getattr(tweet, "lang", None),
+                   conversation_id=getattr(tweet, "conversation_id", None),
+                   like_count=metrics.get("like_count", 0),
+                   retweet_count=metrics.get("retweet_count", 0),
+                   quote_count=metrics.get("quote_count", 0),
+                   reply_count=metrics.get("reply_count", 0),
+                   relevance_score=relevance_score)
+
+    @property
+    def public_metrics(self) -> dict:
+        return {"like_count": self.like_count, "retweet_count": self.retweet_count,
+                "quote_count": self.quote_count, "reply_count": self.reply_count}
+
+    def __repr__(self) -> str:
+        return "TweetRecord(id={}, created_at={})".format(self.id, self.created_at)
@@ -0,0 +1,130 @@
+import re
+import ahocorasick
+
+# RegEx pattern for naive CDC filtering
+CDC_PATTERN = re.compile(
+    r"""
+    (?:
+        \bCDC\b
+        (?![A-Za-z0-9_])
+    )
+    |
+    (?:\bCenters\s+for\s+Disease\s+Control(?:\s+and\s+Prevention)?\b)
+    |
+    (?:@CDCgov)
+    |
+    (?<![#\w])\#CDC(?![A-Za-z0-9_])
+    """,
+    re.IGNORECASE | re.VERBOSE
+)
+
+# Terms that make a CDC mention more likely to be about the U.S. agency, with
+# the weight each adds to the relevance score. Mirrors the boosted terms of the
+# dashboard's search_query_alt.
+POSITIVE_TERMS = {
+    "centers for disease control and prevention": 10.0,
+    "covid": 1.0,
+    "vaccine": 1.0,
+    "outbreak": 1.0,
+    "confirmed": 1.0,
+    "public health": 1.0,
+    "disease": 1.0,
+    "funding": 1.0,
+    "director": 1.0,
+    "alert": 1.0,
+    "cases": 1.0,
+    "advisory": 1.0,
+    "tb": 1.0,
+    "nominate": 1.0,
+    "lead": 1.0,
+    "picks": 1.0,
+    "us": 1.0,
+    "usa": 1.0,
+    "nurses": 1.0,
+    "pharmacists": 1.0,
+    "delegates": 1.0,
+    "leadership": 1.0,
+    "documents": 1.0
+}
+
+# Terms that mark a CDC mention as another organization or spam, mirroring the
+# excluded terms of the dashboard's search_query_alt
+NEGATIVE_TERMS = [
+    "africa cdc",
+    "cdc_tb",
+    "cdc_europe",
+    "cdc_upland",
+    "vehicle technician",
+    "job alert",
+    "@cdc_zimbabwe",
+    "@loadedlions_cdc"
+]
+
+# Score given to any tweet matching CDC_PATTERN before term weights are added
+BASE_SCORE = 1.0
+
+# Minimum score for a tweet to count towards the dashboard, a CDC mention plus
+# at least one positive term
+RELEVANCE_THRESHOLD = 2.0
+
+
+def build_automaton() -> ahocorasick.Automaton:
+    """Function that builds one Aho-Corasick automaton over the positive and
+    negative terms so each tweet is scanned once for all of them.
+
+    Returns:
+        ahocorasick.Automaton: The automaton, values are (term, weight) with a
+            weight of None for negative terms
+    """
+    automaton = ahocorasick.Automaton()
+    for term, weight in POSITIVE_TERMS.items():
+        automaton.add_word(term, (term, weight))
+    for term in NEGATIVE_TERMS:
+        automaton.add_word(term, (term, None))
+    automaton.make_automaton()
+    return automaton
+
+
+_automaton = build_automaton()
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+def score_relevance(tweet_text: str) -> float:
+    """Function that scores how likely a tweet is about the U.S. CDC.
+
+    The score is 0 when the tweet does not mention the CDC or contains a
+    negative term, otherwise BASE_SCORE plus the weight of each distinct
+    positive term found as a whole word.
+
+    Parameters:
+        tweet_text (str): The text of the tweet
+
+    Returns:
+        float: The relevance score
+    """
+    if not tweet_text or not CDC_PATTERN.search(tweet_text):
+        return 0.0
+
+    text = tweet_text.lower()
+    score = BASE_SCORE
+    found = set()
+    for end_index, (term, weight) in _automaton.iter(text):
+        start_index = end_index - len(term) + 1
+
+        # Terms are matched as substrings, require word boundaries around them
+        if start_index > 0 and _is_word_char(text[start_index - 1]) \
+                and _is_word_char(term[0]):
+            continue
+        if end_index + 1 < len(text) and _is_word_char(text[end_index + 1]) \
+                and _is_word_char(term[-1]):
+            continue
+
+        if weight is None:
+            return 0.0
+        if term not in found:
+            found.add(term)
+            score += weight
+    return score
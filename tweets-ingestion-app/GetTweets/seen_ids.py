@@ -0,0 +1,95 @@
+import json
+from datetime import date, timedelta
+from typing import Iterable, Iterator
+from azure.core.exceptions import ResourceNotFoundError
+from azure.storage.blob import BlobClient
+from .storage import SKIP_INDEXING_METADATA
+
+# Blob path of the seen chunk ids, kept next to the checkpoint
+SEEN_IDS_BLOB_PATH = "cdc-seen-ids.json"
+
+
+class SeenChunkIds:
+    """Persistent set of chunk ids that were already uploaded, bucketed by the
+    day they were uploaded so old buckets expire after retention_days.
+
+    Since generate_chunk_id hashes the chunk text, an id that was seen before
+    means the same text for the same tweet is already indexed and enriched.
+
+    Parameters:
+        buckets (dict[str, list[str]]): Sorted chunk ids keyed by ISO date
+        retention_days (int): The number of days a chunk id is remembered
+    """
+    def __init__(self, buckets: dict[str, list[str]], retention_days: int):
+        self.buckets = buckets
+        self.retention_days = retention_days
+        self._ids = set()
+        for ids in buckets.values():
+            self._ids.update(ids)
+        self._new_ids = set()
+
+    @classmethod
+    def load(cls, blob_client: BlobClient, retention_days: int = 7) -> "SeenChunkIds":
+        """Function that reads the seen chunk ids from storage.
+
+        Parameters:
+            blob_client (BlobClient): The client for the seen ids blob
+            retention_days (int): The number of days a chunk id is remembered
+
+        Returns:
+            SeenChunkIds: The seen ids, empty on the first run
+        """
+        try:
+            data = blob_client.download_blob().readall()
+        except ResourceNotFoundError:
+            return cls(buckets={}, retention_days=retention_days)
+        return cls(buckets=json.loads(data), retention_days=retention_days)
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def filter_unseen(self, chunks: Iterable[dict]) -> Iterator[dict]:
+        """Function that drops chunks whose id was already uploaded and marks
+        the rest as seen.
+
+        Parameters:
+            chunks (Iterable[dict]): The chunks to check, consumed lazily
+
+        Returns:
+            Iterator[dict]: The chunks not seen before
+        """
+        for chunk in chunks:
+            chunk_id = chunk["id"]
+            if chunk_id in self._ids:
+                continue
+            self._ids.add(chunk_id)
+            self._new_ids.add(chunk_id)
+            yield chunk
+
+    def save(self, blob_client: BlobClient, today: date) -> None:
+        """Function that adds this run's ids under today's bucket, expires
+        buckets older than retention_days and writes the result to storage.
+
+        Parameters:
+            blob_client (BlobClient): The client for the seen ids blob
+            today (date): The date of this run
+
+        Returns:
+            None
+        """
+        key = today.isoformat()
+        self.buckets[key] = sorted(self._new_ids.union(self.buckets.get(key, [])))
+        self._new_ids = set()
+
+        # ISO dates sort lexically so old buckets can be compared as strings
+        cutoff = (today - timedelta(days=self.retention_days)).isoformat()
+        self.buckets = {day: ids for day, ids in self.buckets.items() if day > cutoff}
+        self._ids = set()
+        for ids in self.buckets.values():
+            self._ids.update(ids)
+
+        blob_client.upload_blob(json.dumps(self.buckets, separators=(",", ":")),
+                                overwrite=True, metadata=SKIP_INDEXING_METADATA)
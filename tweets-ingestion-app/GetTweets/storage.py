@@ -0,0 +1,143 @@
+import base64
+import json
+from datetime import datetime
+from typing import Iterable, Optional
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, \
+    ResourceNotFoundError
+from azure.storage.blob import BlobClient, BlobBlock
+
+# Size of each staged block, the final block may be smaller
+BLOCK_SIZE = 4 * 1024 * 1024
+
+# Blob path of the ingestion checkpoint, kept next to the chunk folders
+CHECKPOINT_BLOB_PATH = "cdc-checkpoint.json"
+
+# Blob path of the data version the analysis app keys its caches on
+DATA_VERSION_BLOB_PATH = "cdc-data-version.json"
+
+# Metadata that tells the blob indexer to skip state blobs in the container
+SKIP_INDEXING_METADATA = {"AzureSearch_Skip": "true"}
+
+# Compact separators, indentation roughly doubles the payload size
+_json_encoder = json.JSONEncoder(separators=(",", ":"))
+
+
+def upload_chunks(blob_client: BlobClient, chunks: Iterable[dict],
+                  block_size: int = BLOCK_SIZE) -> int:
+    """Function that streams chunks into the blob as a compact JSON array,
+    staging a block every block_size bytes and committing the block list at
+    the end so peak memory stays at one block regardless of run size.
+
+    Parameters:
+        blob_client (BlobClient): The client for the destination blob
+        chunks (Iterable[dict]): The chunks to write, consumed lazily
+        block_size (int): The number of bytes to buffer before staging a block
+
+    Returns:
+        int: The number of chunks uploaded
+    """
+    block_ids = []
+
+    def stage(data: bytearray) -> None:
+        # Block ids must be base64 and the same length within a blob
+        block_id = base64.b64encode("{:08d}".format(len(block_ids)).encode()).decode()
+        blob_client.stage_block(block_id=block_id, data=bytes(data))
+        block_ids.append(BlobBlock(block_id=block_id))
+
+    count = 0
+    buffer = bytearray(b"[")
+    for chunk in chunks:
+        if count:
+            buffer += b","
+        buffer += _json_encoder.encode(chunk).encode()
+        count += 1
+
+        if len(buffer) >= block_size:
+            stage(buffer)
+            buffer = bytearray()
+
+    buffer += b"]"
+    stage(buffer)
+
+    # Committing replaces any existing blob, matching upload_blob(overwrite=True)
+    blob_client.commit_block_list(block_ids)
+    return count
+
+
+def load_checkpoint(blob_client: BlobClient) -> Optional[dict]:
+    """Function that reads the ingestion checkpoint recording the newest tweet
+    ingested so far.
+
+    Parameters:
+        blob_client (BlobClient): The client for the checkpoint blob
+
+    Returns:
+        Optional[dict]: The checkpoint with "since_id" and "created_at" keys,
+            or None on the first run
+    """
+    try:
+        data = blob_client.download_blob().readall()
+    except ResourceNotFoundError:
+        return None
+    return json.loads(data)
+
+
+def save_checkpoint(blob_client: BlobClient, since_id: int,
+                    created_at: str) -> None:
+    """Function that writes the ingestion checkpoint after a successful run.
+
+    Parameters:
+        blob_client (BlobClient): The client for the checkpoint blob
+        since_id (int): The id of the newest tweet ingested
+        created_at (str): The ISO timestamp of the newest tweet ingested
+
+    Returns:
+        None
+    """
+    checkpoint = {"since_id": str(since_id), "created_at": created_at}
+    blob_client.upload_blob(_json_encoder.encode(checkpoint), overwrite=True,
+                            metadata=SKIP_INDEXING_METADATA)
+
+
+def publish_data_version(blob_client: BlobClient, indexed_through: datetime) -> Optional[int]:
+    """Function that increments the data version for an indexer run that
+    finished after the last published one, so the analysis app can drop
+    cached results exactly when enriched data lands. The write only succeeds
+    if the blob is unchanged since it was read, so the version never goes
+    backwards and a run is never published twice.
+
+    Parameters:
+        blob_client (BlobClient): The client for the data version blob
+        indexed_through (datetime): The end time of the finished indexer run
+
+    Returns:
+        Optional[int]: The new data version, or None if the run was already
+            published
+    """
+    while True:
+        try:
+            downloader = blob_client.download_blob()
+            current = json.loads(downloader.readall())
+            etag = downloader.properties.etag
+        except ResourceNotFoundError:
+            current, etag = {"version": 0, "indexed_through": None}, None
+
+        if current["indexed_through"] is not None and \
+                datetime.fromisoformat(current["indexed_through"]) >= indexed_through:
+            return None
+
+        data_version = {"version": current["version"] + 1,
+                        "indexed_through": indexed_through.isoformat()}
+        try:
+            if etag is None:
+                blob_client.upload_blob(_json_encoder.encode(data_version), overwrite=False,
+                                        metadata=SKIP_INDEXING_METADATA)
+            else:
+                blob_client.upload_blob(_json_encoder.encode(data_version), overwrite=True,
+                                        etag=etag, match_condition=MatchConditions.IfNotModified,
+                                        metadata=SKIP_INDEXING_METADATA)
+            return data_version["version"]
+        except (ResourceExistsError, ResourceModifiedError):
+            # Another invocation published first, compare against its version
+            continue
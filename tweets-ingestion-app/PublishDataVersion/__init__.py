@@ -0,0 +1,54 @@
+import os
+import logging
+import azure.functions as func
+from azure.identity import DefaultAzureCredential
+from azure.core.credentials import AzureKeyCredential
+from azure.keyvault.secrets import SecretClient
+from azure.storage.blob import BlobServiceClient
+from azure.search.documents.indexes import SearchIndexerClient
+from GetTweets.storage import publish_data_version, DATA_VERSION_BLOB_PATH
+
+
+def main(indexertimer: func.TimerRequest) -> None:
+    """Function that publishes a new data version when the indexer's last
+    run succeeded after the last published one. Runs on its own timer so
+    the wait for the indexer does not count against the ingestion run, and
+    only enriched documents, not just pushed ones, change the version.
+
+    Parameters:
+        indexertimer (func.TimerRequest): The trigger that defines
+            how often to check the indexer status
+
+    Returns:
+        None
+    """
+    credential = DefaultAzureCredential()
+
+    keyvault_uri = os.environ["KEY_VAULT_URI"]
+    keyvault_client = SecretClient(vault_url=keyvault_uri,
+                                   credential=credential)
+
+    search_endpoint = keyvault_client.get_secret("SEARCH-ENDPOINT").value
+    search_key = keyvault_client.get_secret("SEARCH-KEY").value
+    indexer_name = keyvault_client.get_secret("SEARCH-INDEXER-NAME").value
+
+    indexer_client = SearchIndexerClient(endpoint=search_endpoint,
+                                         credential=AzureKeyCredential(search_key))
+    result = indexer_client.get_indexer_status(name=indexer_name).last_result
+    if result is None or result.status != "success" or result.end_time is None:
+        # In progress, failed or never run, check again on the next trigger
+        return
+
+    blob_url = keyvault_client.get_secret("TWEETS-BLOB-URL").value
+    blob_container = keyvault_client.get_secret("TWEETS-BLOB-CONTAINER").value
+    blob_service = BlobServiceClient(account_url=blob_url, credential=credential)
+
+    data_version_client = blob_service.get_blob_client(container=blob_container,
+                                                       blob=DATA_VERSION_BLOB_PATH)
+    data_version = publish_data_version(blob_client=data_version_client,
+                                        indexed_through=result.end_time)
+    if data_version is not None:
+        logging.info("Published data version {} for indexer run finished at {}, "
+                     "{} items processed and {} failed"
+                     .format(data_version, result.end_time, result.item_count,
+                             result.failed_item_count))
@@ -0,0 +1,77 @@
+"""Micro-benchmark comparing the CDC regex filter used by is_about_cdc with the
+regex plus Aho-Corasick relevance scorer over a synthetic tweet corpus.
+
+Run from tweets-ingestion-app:
+
+    python -m benchmarks.relevance_benchmark --num-tweets 1000000
+"""
+import argparse
+import random
+import time
+from GetTweets.relevance import CDC_PATTERN, score_relevance
+
+# Fragments used to build synthetic tweets, a mix of relevant, negative and
+# unrelated mentions of the CDC
+SUBJECTS = [
+    "CDC", "The CDC", "Centers for Disease Control and Prevention", "@CDCgov",
+    "#CDC", "Africa CDC", "CDC_Europe", "Our CDC pipeline", "The school"
+]
+VERBS = [
+    "confirms", "warns about", "releases documents on", "cuts funding for",
+    "issues an advisory on", "is hiring for", "posted a job alert for",
+    "streams change data for", "announces"
+]
+OBJECTS = [
+    "new measles cases in the US", "the COVID vaccine rollout",
+    "a bird flu outbreak", "TB screening for nurses and pharmacists",
+    "its new director picks", "a vehicle technician role",
+    "Kafka topics and Debezium connectors", "public health leadership changes",
+    "the weekend bake sale"
+]
+TAILS = ["", " Read more:", " #health", " Thoughts?", " https://t.co/abc123"]
+
+
+def build_corpus(num_tweets: int, seed: int) -> list[str]:
+    """Function that builds a reproducible list of synthetic tweets.
+
+    Parameters:
+        num_tweets (int): The number of tweets to build
+        seed (int): The random seed
+
+    Returns:
+        list[str]: The synthetic tweets
+    """
+    rng = random.Random(seed)
+    return [
+        "{} {} {}.{}".format(rng.choice(SUBJECTS), rng.choice(VERBS),
+                             rng.choice(OBJECTS), rng.choice(TAILS))
+        for _ in range(num_tweets)
+    ]
+
+
+def run_regex(corpus: list[str]) -> int:
+    return sum(1 for text in corpus if CDC_PATTERN.search(text))
+
+
+def run_relevance(corpus: list[str]) -> int:
+    return sum(1 for text in corpus if score_relevance(text) > 0)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--num-tweets", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    corpus = build_corpus(num_tweets=args.num_tweets, seed=args.seed)
+
+    for name, run in [("regex", run_regex), ("relevance", run_relevance)]:
+        start = time.perf_counter()
+        matched = run(corpus)
+        elapsed = time.perf_counter() - start
+        print("{:<10} {:>10,} kept  {:>8.2f}s  {:>12,.0f} tweets/s".format(
+            name, matched, elapsed, len(corpus) / elapsed))
+
+
+if __name__ == "__main__":
+    main()
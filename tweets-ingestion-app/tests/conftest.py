@@ -0,0 +1,24 @@
+import os
+import sys
+import pytest
+
+# Tests import the function folders the same way the Functions host does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from GetTweets import chunking
+
+
+class FakeEncoder:
+    """Stands in for the tiktoken encoder, one token per character, so tests
+    do not download the encoding."""
+    def encode(self, text: str) -> list[int]:
+        return [ord(char) for char in text]
+
+    def encode_batch(self, texts: list[str], num_threads: int = 8) -> list[list[int]]:
+        return [self.encode(text) for text in texts]
+
+
+@pytest.fixture(autouse=True)
+def fake_encoder(monkeypatch):
+    monkeypatch.setitem(chunking._encoders, "text-embedding-3-small", FakeEncoder())
+    monkeypatch.setattr(chunking, "_chunkers", {})
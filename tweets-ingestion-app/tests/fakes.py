@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+from azure.core.exceptions import HttpResponseError, ResourceExistsError, \
+    ResourceModifiedError, ResourceNotFoundError
+
+
+class FakeBlobClient:
+    """In-memory blob with the parts of the BlobClient API ingestion uses,
+    including etag conditions and staged blocks."""
+    def __init__(self, data: bytes = None):
+        self.data = data
+        self.etag = 0 if data is None else 1
+        self.metadata = None
+        self.staged = {}
+        self.upload_count = 0
+
+    def download_blob(self):
+        if self.data is None:
+            raise ResourceNotFoundError("Blob not found")
+        data, etag = self.data, self.etag
+        return SimpleNamespace(readall=lambda: data,
+                               properties=SimpleNamespace(etag=str(etag)))
+
+    def upload_blob(self, data, overwrite=False, metadata=None, etag=None,
+                    match_condition=None):
+        if not overwrite and self.data is not None:
+            raise ResourceExistsError("Blob exists")
+        if etag is not None and etag != str(self.etag):
+            raise ResourceModifiedError("Blob modified")
+        self.data = data.encode() if isinstance(data, str) else data
+        self.etag += 1
+        self.metadata = metadata
+        self.upload_count += 1
+
+    def stage_block(self, block_id: str, data: bytes):
+        self.staged[block_id] = data
+
+    def commit_block_list(self, blocks):
+        self.data = b"".join(self.staged[block.id] for block in blocks)
+        self.etag += 1
+
+
+class FakeSearchClient:
+    """Records merge_or_upload_documents and merge_documents calls and fails
+    the keys in failures with their status code, once each. Whole requests
+    fail with the status codes in request_failures, one request each.
+    Documents pushed successfully are added to indexed, merge_documents
+    fails with 404 for keys not in it."""
+    def __init__(self, failures: dict = None, request_failures: list = None,
+                 indexed: set = None):
+        self.failures = dict(failures or {})
+        self.request_failures = list(request_failures or [])
+        self.indexed = set(indexed or [])
+        self.batches = []
+
+    def merge_documents(self, documents):
+        for document in documents:
+            if document["id"] not in self.indexed:
+                self.failures.setdefault(document["id"], 404)
+        return self.merge_or_upload_documents(documents)
+
+    def merge_or_upload_documents(self, documents):
+        self.batches.append(documents)
+        if self.request_failures:
+            error = HttpResponseError(message="Request failed")
+            error.status_code = self.request_failures.pop(0)
+            raise error
+        results = []
+        for document in documents:
+            status_code = self.failures.pop(document["id"], 200)
+            if status_code < 300:
+                self.indexed.add(document["id"])
+            results.append(SimpleNamespace(key=document["id"], succeeded=status_code < 300,
+                                           status_code=status_code))
+        return results
@@ -0,0 +1,51 @@
+from GetTweets.chunking import chunk_text, chunk_texts, get_chunker, get_encoder, generate_chunk_id, hash_text
+
+MODEL = "text-embedding-3-small"
+
+
+def test_short_text_is_one_stripped_chunk():
+    assert chunk_text("  CDC issues guidance \n", chunk_size=50, chunk_overlap=5,
+                      encoding_model=MODEL) == ["CDC issues guidance"]
+
+
+def test_blank_text_has_no_chunks():
+    assert chunk_text(" \n ", chunk_size=50, chunk_overlap=5, encoding_model=MODEL) == []
+
+
+def test_long_text_is_split_within_chunk_size():
+    text = " ".join("word{}".format(i) for i in range(100))
+    chunks = chunk_text(text, chunk_size=40, chunk_overlap=5, encoding_model=MODEL)
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 40 for chunk in chunks)
+    assert chunks[0].startswith("word0 ")
+    assert chunks[-1].endswith("word99")
+
+
+def test_chunk_texts_matches_chunk_text_in_order():
+    texts = ["first tweet", "", " ".join(["long"] * 30), "last tweet "]
+    batch = chunk_texts(texts, chunk_size=40, chunk_overlap=5, encoding_model=MODEL)
+
+    assert batch == [chunk_text(text, chunk_size=40, chunk_overlap=5, encoding_model=MODEL)
+                     for text in texts]
+
+
+def test_chunk_texts_of_nothing():
+    assert chunk_texts([], chunk_size=40, chunk_overlap=5, encoding_model=MODEL) == []
+
+
+def test_chunker_is_built_once_per_configuration():
+    chunker = get_chunker(encoding_model=MODEL, chunk_size=40, chunk_overlap=5)
+
+    assert get_chunker(encoding_model=MODEL, chunk_size=40, chunk_overlap=5) is chunker
+    assert get_chunker(encoding_model=MODEL, chunk_size=50, chunk_overlap=5) is not chunker
+    assert chunker.encoder is get_encoder(MODEL)
+
+
+def test_chunk_id_depends_on_tweet_and_text():
+    chunk_id = generate_chunk_id(id=123, text="CDC update")
+
+    assert chunk_id == "123-{}".format(hash_text("CDC update")[:10])
+    assert generate_chunk_id(id=123, text="CDC update") == chunk_id
+    assert generate_chunk_id(id=124, text="CDC update") != chunk_id
+    assert generate_chunk_id(id=123, text="CDC update!") != chunk_id
@@ -0,0 +1,57 @@
+from types import SimpleNamespace
+from GetTweets.embeddings import embed_chunks, EmbeddingCache
+from GetTweets.chunking import hash_text
+
+
+class FakeEmbeddings:
+    """Embeds each text as its length and returns the results out of order."""
+    def __init__(self):
+        self.inputs = []
+
+    def create(self, model, input, dimensions):
+        self.inputs.append(list(input))
+        return SimpleNamespace(data=[SimpleNamespace(index=i, embedding=[float(len(text))])
+                                     for i, text in reversed(list(enumerate(input)))])
+
+
+def embed(chunks, cache, batch_size=4, max_concurrency=2):
+    embeddings = FakeEmbeddings()
+    client = SimpleNamespace(embeddings=embeddings)
+    return embeddings, embed_chunks(chunks=chunks, openai_client=client, deployment="embedding",
+                                    cache=cache, dimensions=1, batch_size=batch_size,
+                                    max_concurrency=max_concurrency)
+
+
+def test_every_chunk_gets_the_vector_of_its_text_in_order():
+    chunks = [{"id": i, "text": "t" * (i % 30 + 1)} for i in range(100)]
+    embeddings, embedded = embed(iter(chunks), EmbeddingCache(buckets={}, retention_days=3))
+
+    assert [chunk["id"] for chunk in embedded] == list(range(100))
+    assert all(chunk["text_vector"] == [float(len(chunk["text"]))] for chunk in chunks)
+    # Repeated texts are embedded once across windows, in batches of at most 4
+    assert sorted(text for batch in embeddings.inputs for text in batch) == \
+        sorted({chunk["text"] for chunk in chunks})
+    assert max(len(batch) for batch in embeddings.inputs) == 4
+
+
+def test_cached_vectors_are_not_embedded_again():
+    cache = EmbeddingCache(buckets={}, retention_days=3)
+    cache.put(hash_text("cached"), [9.0])
+    embeddings, embedded = embed([{"id": 1, "text": "cached"}, {"id": 2, "text": "new"}], cache)
+
+    assert [chunk["text_vector"] for chunk in embedded] == [[9.0], [3.0]]
+    assert embeddings.inputs == [["new"]]
+
+
+def test_chunks_are_read_one_window_at_a_time():
+    read = []
+
+    def chunks():
+        for i in range(100):
+            read.append(i)
+            yield {"id": i, "text": str(i)}
+
+    _, embedded = embed(chunks(), EmbeddingCache(buckets={}, retention_days=3))
+    next(embedded)
+
+    assert len(read) == 8
@@ -0,0 +1,97 @@
+import json
+from GetTweets.indexing import to_index_document, batch_documents, push_chunks, push_documents
+from fakes import FakeSearchClient
+
+
+def make_chunk(i: int) -> dict:
+    return {"id": "{:03d}".format(i), "text": "x" * 100, "author_id": 7, "conversation_id": None,
+            "language": "en", "ingestion_date": "2025-05-01T00:00:00+00:00"}
+
+
+def test_to_index_document_keeps_index_fields_and_stringifies_ids():
+    document = to_index_document(make_chunk(1))
+
+    assert document == {"id": "001", "text": "x" * 100, "author_id": "7",
+                        "conversation_id": None, "language": "en"}
+
+
+def test_batch_documents_respects_bytes_and_size():
+    documents = [to_index_document(make_chunk(i)) for i in range(50)]
+    document_bytes = len(json.dumps(documents[0], separators=(",", ":")))
+
+    batches = list(batch_documents(documents, max_batch_bytes=document_bytes * 4))
+    assert [len(batch) for batch in batches] == [4] * 12 + [2]
+    assert [document for batch in batches for document in batch] == documents
+
+    batches = list(batch_documents(documents, max_batch_bytes=10 ** 6, max_batch_size=20))
+    assert [len(batch) for batch in batches] == [20, 20, 10]
+
+
+def test_batch_documents_keeps_oversized_documents():
+    documents = [{"id": "1", "text": "x" * 1000}, {"id": "2", "text": "y"}]
+
+    assert list(batch_documents(documents, max_batch_bytes=100)) == [[documents[0]], [documents[1]]]
+
+
+def test_push_chunks_yields_every_chunk_in_order():
+    search_client = FakeSearchClient()
+    chunks = [make_chunk(i) for i in range(50)]
+
+    pushed = list(push_chunks(search_client=search_client, chunks=iter(chunks),
+                              max_batch_bytes=1000, max_concurrency=2))
+
+    assert pushed == chunks
+    assert sorted(int(document["id"]) for batch in search_client.batches
+                  for document in batch) == list(range(50))
+    assert all("ingestion_date" not in document for batch in search_client.batches
+               for document in batch)
+
+
+def test_push_chunks_reads_ahead_at_most_the_batches_in_flight():
+    search_client = FakeSearchClient()
+    read = []
+
+    def chunks():
+        for i in range(1000):
+            read.append(i)
+            yield make_chunk(i)
+
+    pushed = push_chunks(search_client=search_client, chunks=chunks(),
+                         max_batch_bytes=1000, max_concurrency=2)
+    next(pushed)
+
+    # Each batch holds 7 documents, one batch and the next document were read
+    assert len(read) < 20
+
+
+def test_push_chunks_retries_only_retryable_failures():
+    search_client = FakeSearchClient(failures={"003": 503, "005": 400})
+
+    list(push_chunks(search_client=search_client, chunks=[make_chunk(i) for i in range(10)]))
+
+    assert [len(batch) for batch in search_client.batches] == [10, 1]
+    assert search_client.batches[1][0]["id"] == "003"
+
+
+def test_push_documents_merges_partial_documents_into_indexed_ones_only():
+    search_client = FakeSearchClient(indexed={"1"})
+    updates = [{"id": "1", "duplicate_count": 2, "cluster_popularity_score": 3.5},
+               {"id": "2", "duplicate_count": 3, "cluster_popularity_score": 1.0}]
+
+    push_documents(search_client=search_client, documents=updates)
+
+    # The missing document is neither retried nor uploaded
+    assert search_client.batches == [updates]
+    assert search_client.indexed == {"1"}
+
+
+def test_push_chunks_splits_only_throttled_or_oversized_requests():
+    search_client = FakeSearchClient(request_failures=[429])
+
+    list(push_chunks(search_client=search_client, chunks=[make_chunk(i) for i in range(3)]))
+    assert [len(batch) for batch in search_client.batches] == [3, 1, 1, 1]
+
+    search_client = FakeSearchClient(request_failures=[400])
+
+    list(push_chunks(search_client=search_client, chunks=[make_chunk(i) for i in range(3)]))
+    assert [len(batch) for batch in search_client.batches] == [3]
@@ -0,0 +1,78 @@
+import json
+from datetime import date
+from GetTweets.near_duplicates import NearDuplicateIndex, simhash, MAX_DISTANCE
+from fakes import FakeBlobClient
+
+HEADLINE = "CDC issues new guidance on measles vaccination for travelers this summer"
+
+
+def make_chunk(chunk_id: str, text: str, created_at: str = "2025-05-01T10:00:00+00:00",
+               popularity_score: float = 1.0) -> dict:
+    return {"id": chunk_id, "text": text, "created_at": created_at,
+            "popularity_score": popularity_score, "like_count": 3}
+
+
+def distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def test_simhash_ignores_links_mentions_case_and_retweet_prefix():
+    fingerprint = simhash(HEADLINE)
+
+    assert simhash("RT @news: " + HEADLINE.upper() + " https://t.co/abc @CDCgov") == fingerprint
+    assert distance(simhash("Unrelated post about the weather and a football match"),
+                    fingerprint) > MAX_DISTANCE
+
+
+def test_collapse_yields_representatives_with_their_own_metrics():
+    index = NearDuplicateIndex(buckets={}, retention_days=3)
+    chunks = [make_chunk("a", HEADLINE, popularity_score=2.0),
+              make_chunk("b", HEADLINE + " https://t.co/x", popularity_score=3.0),
+              make_chunk("c", "Unrelated post about the weather and a football match")]
+
+    collapsed = list(index.collapse(chunks))
+
+    assert collapsed == [chunks[0], chunks[2]]
+    assert "duplicate_count" not in collapsed[0]
+    assert collapsed[0]["popularity_score"] == 2.0
+    assert index.cluster_updates() == [
+        {"id": "a", "duplicate_count": 2, "cluster_popularity_score": 5.0}]
+
+
+def test_collapse_only_clusters_tweets_of_the_same_day():
+    index = NearDuplicateIndex(buckets={}, retention_days=3)
+    chunks = [make_chunk("a", HEADLINE, created_at="2025-05-01T23:59:00+00:00"),
+              make_chunk("b", HEADLINE, created_at="2025-05-02T00:01:00+00:00")]
+
+    assert [chunk["id"] for chunk in index.collapse(chunks)] == ["a", "b"]
+    assert index.cluster_updates() == []
+
+
+def test_collapse_is_lazy():
+    index = NearDuplicateIndex(buckets={}, retention_days=3)
+
+    def chunks():
+        yield make_chunk("a", HEADLINE)
+        raise AssertionError("read past the first chunk")
+
+    assert next(index.collapse(chunks()))["id"] == "a"
+
+
+def test_clusters_carry_over_runs_until_they_expire():
+    blob_client = FakeBlobClient()
+    index = NearDuplicateIndex.load(blob_client=blob_client, retention_days=3)
+    list(index.collapse([make_chunk("a", HEADLINE, popularity_score=2.0),
+                         make_chunk("b", HEADLINE, popularity_score=1.0)]))
+    index.save(blob_client=blob_client, today=date(2025, 5, 1))
+
+    index = NearDuplicateIndex.load(blob_client=blob_client, retention_days=3)
+    assert list(index.collapse([make_chunk("c", HEADLINE, popularity_score=4.0)])) == []
+    assert index.cluster_updates() == [
+        {"id": "a", "duplicate_count": 3, "cluster_popularity_score": 7.0}]
+    index.save(blob_client=blob_client, today=date(2025, 5, 1))
+    assert index.cluster_updates() == []
+
+    # The day of the cluster is past retention four days later
+    index.save(blob_client=blob_client, today=date(2025, 5, 4))
+    assert json.loads(blob_client.data) == {}
+    assert len(index) == 0
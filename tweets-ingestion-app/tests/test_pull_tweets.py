@@ -0,0 +1,127 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import pytest
+import GetTweets
+
+START = datetime(2025, 5, 1, tzinfo=timezone.utc)
+END = START + timedelta(hours=4)
+
+
+def make_tweets(minutes: list[int]) -> list[SimpleNamespace]:
+    return [SimpleNamespace(id=i, text="CDC vaccine outbreak update {}".format(i),
+                            created_at=START + timedelta(minutes=minute), author_id=1,
+                            lang="en", conversation_id=None,
+                            public_metrics={"like_count": 1, "retweet_count": 0,
+                                            "quote_count": 0, "reply_count": 0})
+            for i, minute in enumerate(sorted(minutes), start=1)]
+
+
+class FakeTwitterClient:
+    """Serves the tweets of the requested window newest first, a page at a
+    time, with the offset of the next page as its token. Like the API,
+    since_id takes precedence over start_time."""
+    tweets = []
+    requests = []
+
+    def __init__(self, **kwargs):
+        pass
+
+    async def search_recent_tweets(self, start_time, end_time, max_results, next_token,
+                                   since_id, **kwargs):
+        self.requests.append(since_id)
+        end = datetime.fromisoformat(end_time)
+        if since_id is None:
+            start = datetime.fromisoformat(start_time)
+            matching = (tweet for tweet in self.tweets if start <= tweet.created_at < end)
+        else:
+            matching = (tweet for tweet in self.tweets
+                        if tweet.id > int(since_id) and tweet.created_at < end)
+        matching = sorted(matching, key=lambda tweet: -tweet.id)
+        offset = int(next_token or 0)
+        await asyncio.sleep(0)
+        meta = {}
+        if offset + max_results < len(matching):
+            meta["next_token"] = str(offset + max_results)
+        return SimpleNamespace(data=matching[offset:offset + max_results],
+                               includes={"users": [SimpleNamespace(id=1, username="cdcfan")]},
+                               meta=meta)
+
+
+@pytest.fixture
+def twitter(monkeypatch):
+    monkeypatch.setattr(GetTweets.tweepy.asynchronous, "AsyncClient", FakeTwitterClient)
+    FakeTwitterClient.requests = []
+    return FakeTwitterClient
+
+
+def pull(num_pages: int, start_time: datetime = START, since_id: str = None):
+    return GetTweets.pull_tweets(twitter_token="token", max_results=10, num_pages=num_pages,
+                                 start_time=start_time, end_time=END, since_id=since_id,
+                                 num_slices=4)
+
+
+def test_pulls_every_slice_and_checkpoints_at_the_newest_tweet(twitter):
+    twitter.tweets = make_tweets(range(0, 240, 8))
+
+    tweets, usernames, newest_tweet, checkpoint_tweet = pull(num_pages=8)
+
+    assert sorted(tweet.id for tweet in tweets) == list(range(1, 31))
+    assert usernames == {1: "cdcfan"}
+    assert newest_tweet[0] == checkpoint_tweet[0] == 30
+
+
+def test_checkpoint_stops_below_a_slice_the_budget_cut_short(twitter):
+    # The newest slice needs 3 pages, the other slices one each
+    twitter.tweets = make_tweets(list(range(0, 180, 20)) + list(range(180, 240, 2)))
+
+    tweets, _, newest_tweet, checkpoint_tweet = pull(num_pages=5)
+
+    assert newest_tweet[0] == 39
+    assert len(tweets) < 39
+    # Newest tweet of the three older slices, which were pulled in full
+    assert checkpoint_tweet[0] == 9
+
+    # Resuming from the checkpoint pulls the rest of the newest slice
+    tweets, _, _, checkpoint_tweet = pull(num_pages=8, start_time=checkpoint_tweet[1],
+                                          since_id=str(checkpoint_tweet[0]))
+    assert sorted(tweet.id for tweet in tweets) == list(range(10, 40))
+    assert checkpoint_tweet[0] == 39
+
+
+def test_only_the_oldest_slice_is_pulled_since_the_checkpoint(twitter):
+    twitter.tweets = make_tweets(range(0, 240, 8))
+
+    checkpoint = twitter.tweets[9]
+    tweets, _, _, checkpoint_tweet = pull(num_pages=8, start_time=checkpoint.created_at,
+                                          since_id=str(checkpoint.id))
+
+    assert sorted(tweet.id for tweet in tweets) == list(range(11, 31))
+    assert checkpoint_tweet[0] == 30
+    # One request per slice, the newer slices are bounded by time alone
+    assert sorted(twitter.requests, key=str) == ["10", None, None, None]
+
+
+def test_pages_go_to_the_oldest_slice_first(twitter):
+    # The oldest slice needs 3 of the 4 pages, the newer slices are empty
+    twitter.tweets = make_tweets(range(0, 60, 2))
+
+    tweets, _, newest_tweet, checkpoint_tweet = pull(num_pages=4)
+
+    assert len(tweets) == 30
+    assert newest_tweet[0] == checkpoint_tweet[0] == 30
+
+
+def test_no_checkpoint_when_the_oldest_slice_is_cut_short(twitter):
+    twitter.tweets = make_tweets(range(0, 60, 1))
+
+    tweets, _, newest_tweet, checkpoint_tweet = pull(num_pages=4)
+
+    assert newest_tweet[0] == 60
+    assert checkpoint_tweet is None
+
+
+def test_no_tweets(twitter):
+    twitter.tweets = []
+
+    assert pull(num_pages=4) == ([], {}, None, None)
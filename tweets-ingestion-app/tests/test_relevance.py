@@ -0,0 +1,49 @@
+import pytest
+from GetTweets.relevance import score_relevance, BASE_SCORE, RELEVANCE_THRESHOLD
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "No agency mentioned in this vaccine tweet",
+    "Our CDCs pipeline streams change data",
+])
+def test_no_cdc_mention_scores_zero(text):
+    assert score_relevance(text) == 0.0
+
+
+@pytest.mark.parametrize("text", [
+    "Africa CDC confirms new cases",
+    "CDC vehicle technician job alert",
+    "RT @loadedlions_cdc: CDC outbreak",
+])
+def test_negative_terms_score_zero(text):
+    assert score_relevance(text) == 0.0
+
+
+def test_mention_alone_is_below_threshold():
+    assert score_relevance("The CDC said something") == BASE_SCORE
+    assert score_relevance("The CDC said something") < RELEVANCE_THRESHOLD
+
+
+def test_positive_terms_are_counted_once():
+    score = score_relevance("CDC vaccine outbreak, vaccine vaccine")
+
+    assert score == BASE_SCORE + 2.0
+    assert score >= RELEVANCE_THRESHOLD
+
+
+def test_terms_only_match_whole_words():
+    # "us" inside "virus" and "cases" inside "showcases" do not count
+    assert score_relevance("CDC showcases virus research") == BASE_SCORE
+
+
+@pytest.mark.parametrize("text", ["@CDCgov issues an alert", "#CDC issues an alert",
+                                  "cdc issues an alert"])
+def test_mention_forms(text):
+    assert score_relevance(text) == BASE_SCORE + 1.0
+
+
+def test_full_name_is_weighted():
+    # "disease" in the name is a positive term of its own
+    assert score_relevance("Centers for Disease Control") == BASE_SCORE + 1.0
+    assert score_relevance("Centers for Disease Control and Prevention") == BASE_SCORE + 11.0
@@ -0,0 +1,42 @@
+import json
+from datetime import date
+from GetTweets.seen_ids import SeenChunkIds
+from GetTweets.storage import SKIP_INDEXING_METADATA
+from fakes import FakeBlobClient
+
+
+def test_filter_unseen_drops_seen_and_repeated_ids():
+    seen_ids = SeenChunkIds(buckets={"2025-05-01": ["a"]}, retention_days=7)
+    chunks = [{"id": "a"}, {"id": "b"}, {"id": "b"}, {"id": "c"}]
+
+    assert [chunk["id"] for chunk in seen_ids.filter_unseen(chunks)] == ["b", "c"]
+    assert "b" in seen_ids and "c" in seen_ids
+
+
+def test_filter_unseen_is_lazy():
+    seen_ids = SeenChunkIds(buckets={}, retention_days=7)
+
+    def chunks():
+        yield {"id": "a"}
+        raise AssertionError("read past the first chunk")
+
+    assert next(seen_ids.filter_unseen(chunks()))["id"] == "a"
+
+
+def test_load_missing_blob_is_empty():
+    seen_ids = SeenChunkIds.load(blob_client=FakeBlobClient(), retention_days=7)
+
+    assert len(seen_ids) == 0
+
+
+def test_save_buckets_new_ids_and_expires_old_days():
+    blob_client = FakeBlobClient(json.dumps({"2025-04-20": ["old"], "2025-04-30": ["a"]}).encode())
+    seen_ids = SeenChunkIds.load(blob_client=blob_client, retention_days=7)
+    list(seen_ids.filter_unseen([{"id": "a"}, {"id": "c"}, {"id": "b"}]))
+
+    seen_ids.save(blob_client=blob_client, today=date(2025, 5, 1))
+
+    assert json.loads(blob_client.data) == {"2025-04-30": ["a"], "2025-05-01": ["b", "c"]}
+    assert blob_client.metadata == SKIP_INDEXING_METADATA
+    assert "old" not in seen_ids and "b" in seen_ids
+    assert len(SeenChunkIds.load(blob_client=blob_client, retention_days=7)) == 3
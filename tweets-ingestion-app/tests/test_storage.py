@@ -0,0 +1,66 @@
+import json
+from datetime import datetime, timedelta, timezone
+from GetTweets.storage import upload_chunks, load_checkpoint, save_checkpoint, \
+    publish_data_version, SKIP_INDEXING_METADATA
+from fakes import FakeBlobClient
+
+CREATED_AT = datetime(2025, 5, 1, 12, tzinfo=timezone.utc)
+INDEXED_AT = datetime(2025, 5, 1, 12, tzinfo=timezone.utc)
+
+
+def test_upload_chunks_writes_a_json_array_across_blocks():
+    blob_client = FakeBlobClient()
+    chunks = [{"id": str(i), "text": "x" * 50} for i in range(100)]
+
+    assert upload_chunks(blob_client=blob_client, chunks=iter(chunks), block_size=256) == 100
+    assert len(blob_client.staged) > 1
+    assert json.loads(blob_client.data) == chunks
+
+
+def test_upload_chunks_of_nothing_is_an_empty_array():
+    blob_client = FakeBlobClient()
+
+    assert upload_chunks(blob_client=blob_client, chunks=[]) == 0
+    assert json.loads(blob_client.data) == []
+
+
+def test_checkpoint_round_trip():
+    blob_client = FakeBlobClient()
+    assert load_checkpoint(blob_client=blob_client) is None
+
+    save_checkpoint(blob_client=blob_client, since_id=42, created_at=CREATED_AT.isoformat())
+
+    assert load_checkpoint(blob_client=blob_client) == {
+        "since_id": "42", "created_at": CREATED_AT.isoformat()}
+    assert blob_client.metadata == SKIP_INDEXING_METADATA
+
+
+def test_publish_data_version_increments_once_per_indexer_run():
+    blob_client = FakeBlobClient()
+
+    assert publish_data_version(blob_client=blob_client, indexed_through=INDEXED_AT) == 1
+    assert publish_data_version(blob_client=blob_client, indexed_through=INDEXED_AT) is None
+    assert publish_data_version(blob_client=blob_client,
+                                indexed_through=INDEXED_AT - timedelta(minutes=5)) is None
+    assert publish_data_version(blob_client=blob_client,
+                                indexed_through=INDEXED_AT + timedelta(minutes=5)) == 2
+    assert json.loads(blob_client.data) == {
+        "version": 2, "indexed_through": (INDEXED_AT + timedelta(minutes=5)).isoformat()}
+
+
+def test_publish_data_version_rereads_after_a_concurrent_write():
+    blob_client = FakeBlobClient()
+    publish_data_version(blob_client=blob_client, indexed_through=INDEXED_AT)
+    upload_blob = blob_client.upload_blob
+
+    def racing_upload_blob(data, **kwargs):
+        # Another invocation publishes a later run between the read and the write
+        blob_client.upload_blob = upload_blob
+        upload_blob(json.dumps({"version": 2, "indexed_through":
+                                (INDEXED_AT + timedelta(minutes=10)).isoformat()}), overwrite=True)
+        upload_blob(data, **kwargs)
+
+    blob_client.upload_blob = racing_upload_blob
+    assert publish_data_version(blob_client=blob_client,
+                                indexed_through=INDEXED_AT + timedelta(minutes=5)) is None
+    assert json.loads(blob_client.data)["version"] == 2
@@ -0,0 +1,89 @@
+"""Throughput benchmark for the incremental follow-up parser run over streamed
+chat completions, replaying recorded streams or synthetic ones.
+
+Run from the repository root:
+
+    python -m tweets_analysis_app.benchmarks.followup_parser_benchmark --num-streams 10000
+
+A recorded stream is a text file with one JSON encoded delta per line, pass
+one or more with --recording to replay them instead of synthetic streams.
+"""
+import argparse
+import json
+import random
+import time
+from tweets_analysis_app.services.followup_parser import FollowupParser
+
+# Answer and follow-ups the synthetic streams are cut from
+ANSWER = (
+    "People are mainly discussing the CDC's updated vaccine guidance for the "
+    "fall season. Several posts question the timing of the announcement, "
+    "while others share where to get boosters and ask whether insurance "
+    "covers them. A smaller group raises concerns about data transparency "
+    "and how case counts are reported.\n\n"
+)
+FOLLOWUPS = [
+    "What concerns are being raised about booster timing?",
+    "Are people discussing insurance coverage for vaccines?",
+    "How are case counts being described?"
+]
+
+
+def build_streams(num_streams: int, seed: int) -> list[list[str]]:
+    """Builds synthetic streams by cutting the completion into deltas of 1 to
+    6 characters, so << and >> are regularly split across deltas."""
+    rng = random.Random(seed)
+    completion = ANSWER + "\n".join("<<{}>>".format(question) for question in FOLLOWUPS)
+    streams = []
+    for _ in range(num_streams):
+        deltas, pos = [], 0
+        while pos < len(completion):
+            size = rng.randint(1, 6)
+            deltas.append(completion[pos:pos + size])
+            pos += size
+        streams.append(deltas)
+    return streams
+
+
+def load_recordings(paths: list[str]) -> list[list[str]]:
+    streams = []
+    for path in paths:
+        with open(path) as f:
+            streams.append([json.loads(line) for line in f if line.strip()])
+    return streams
+
+
+def run_parser(streams: list[list[str]]) -> int:
+    followups = 0
+    for deltas in streams:
+        parser = FollowupParser()
+        for delta in deltas:
+            _, completed = parser.feed(delta)
+            followups += len(completed)
+        _, completed = parser.close()
+        followups += len(completed)
+    return followups
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--num-streams", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--recording", action="append", default=[])
+    args = parser.parse_args()
+
+    if args.recording:
+        streams = load_recordings(args.recording)
+    else:
+        streams = build_streams(num_streams=args.num_streams, seed=args.seed)
+    num_deltas = sum(len(deltas) for deltas in streams)
+
+    start = time.perf_counter()
+    followups = run_parser(streams)
+    elapsed = time.perf_counter() - start
+    print("{:,} streams  {:,} deltas  {:,} follow-ups  {:.2f}s  {:,.0f} deltas/s  {:.2f} us/delta".format(
+        len(streams), num_deltas, followups, elapsed, num_deltas / elapsed, 1e6 * elapsed / num_deltas))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+import os
+import time
+import asyncio
+import pickle
+import hashlib
+import secrets
+import functools
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional, Tuple
+import logging
+from tweets_analysis_app.services.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+_cache_instance = None
+
+
+class MemoryTier:
+    """Per-worker LRU bounded by both entry count and total bytes."""
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        data, expires_at = entry
+        if expires_at <= time.monotonic():
+            self.delete(key)
+            return None
+        self._entries.move_to_end(key)
+        return data
+
+    def set(self, key: str, data: bytes, ttl: float):
+        # Entries larger than the whole budget are only kept in the shared tier
+        if len(data) > self.max_bytes:
+            return
+        self.delete(key)
+        self._entries[key] = (data, time.monotonic() + ttl)
+        self._bytes += len(data)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (evicted, _) = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    def delete(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[0])
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+
+# Deletes a lock only while it still holds the token of the worker releasing it
+_release_script = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class RedisTier:
+    """Shared tier backed by Redis, visible to every worker and instance."""
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+        self._client = redis.from_url(url)
+        self._release = self._client.register_script(_release_script)
+        # Token of each lock this worker holds, a lock that expired and was
+        # taken by another worker holds that worker's token instead
+        self._tokens = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._client.get(key)
+
+    async def set(self, key: str, data: bytes, ttl: float):
+        await self._client.set(key, data, px=int(ttl * 1000))
+
+    async def delete(self, key: str):
+        await self._client.delete(key)
+
+    async def acquire(self, key: str, timeout: float) -> bool:
+        token = secrets.token_hex(16).encode()
+        if not await self._client.set("lock:" + key, token, nx=True, px=int(timeout * 1000)):
+            return False
+        self._tokens[key] = token
+        return True
+
+    async def release(self, key: str):
+        token = self._tokens.pop(key, None)
+        if token is not None:
+            await self._release(keys=["lock:" + key], args=[token])
+
+    async def close(self):
+        await self._client.aclose()
+
+
+class FileTier:
+    """Shared tier backed by a local directory, visible to every worker on the
+    same host. Used when no Redis url is configured and in tests."""
+    def __init__(self, directory: str):
+        self._directory = Path(directory)
+        self._directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self._directory / hashlib.sha256(key.encode()).hexdigest()
+
+    def _read(self, key: str) -> Optional[bytes]:
+        try:
+            raw = self._path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+        expires_at, data = raw.split(b"\n", 1)
+        if float(expires_at) <= time.time():
+            return None
+        return data
+
+    def _write(self, key: str, data: bytes, ttl: float):
+        path = self._path(key)
+        # Write then rename so readers never see a partial entry
+        tmp_path = path.with_name("{}.{}.tmp".format(path.name, os.getpid()))
+        tmp_path.write_bytes("{}\n".format(time.time() + ttl).encode() + data)
+        tmp_path.replace(path)
+
+    def _acquire(self, key: str, timeout: float) -> bool:
+        lock_path = self._path(key).with_suffix(".lock")
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            # Break locks left behind by a worker that died mid-computation
+            try:
+                if lock_path.stat().st_mtime + timeout > time.time():
+                    return False
+                lock_path.unlink()
+            except FileNotFoundError:
+                pass
+            return self._acquire(key, timeout)
+        os.close(fd)
+        return True
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._read, key)
+
+    async def set(self, key: str, data: bytes, ttl: float):
+        await asyncio.to_thread(self._write, key, data, ttl)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self._path(key).unlink, True)
+
+    async def acquire(self, key: str, timeout: float) -> bool:
+        return await asyncio.to_thread(self._acquire, key, timeout)
+
+    async def release(self, key: str):
+        await asyncio.to_thread(self._path(key).with_suffix(".lock").unlink, True)
+
+    async def close(self):
+        pass
+
+
+class CacheStats:
+    """Hit and miss counters with the total time spent serving each."""
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.hit_seconds = 0.0
+        self.miss_seconds = 0.0
+
+    def record(self, hit: bool, seconds: float):
+        if hit:
+            self.hits += 1
+            self.hit_seconds += seconds
+        else:
+            self.misses += 1
+            self.miss_seconds += seconds
+
+    def snapshot(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / max(self.hits + self.misses, 1),
+            "avg_hit_ms": 1000 * self.hit_seconds / max(self.hits, 1),
+            "avg_miss_ms": 1000 * self.miss_seconds / max(self.misses, 1)
+        }
+
+
+class TwoTierCache:
+    """
+    Per-worker LRU in front of a shared tier. Reads check the worker's memory
+    first, then the shared tier. Concurrent misses for the same key are
+    coalesced: within a worker they share one in-flight call, across workers
+    the first to take the shared lock computes while the rest poll the shared
+    tier.
+
+    Entries written with a stale_ttl stay readable for stale_ttl seconds after
+    they expire. get_or_set serves such stale entries immediately and
+    refreshes them with a single background call.
+
+    Values are pickled, so the shared tier must only be reachable by the app.
+    """
+    def __init__(self, shared, default_ttl: float = 300, memory_ttl: float = 60,
+                 max_entries: int = 256, max_bytes: int = 32 * 1024 * 1024,
+                 lock_timeout: float = 30, poll_interval: float = 0.05):
+        self.shared = shared
+        self.default_ttl = default_ttl
+        # Bounds how long a worker can serve a value another worker replaced
+        self.memory_ttl = memory_ttl
+        self.memory = MemoryTier(max_entries=max_entries, max_bytes=max_bytes)
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self._flights = SingleFlight()
+        self._refresh_tasks = set()
+
+    async def get_entry(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Returns the value and the epoch time it stops being fresh."""
+        data = self.memory.get(key)
+        if data is None:
+            data = await self.shared.get(key)
+            if data is None:
+                return None
+            self.memory.set(key, data, self.memory_ttl)
+        return pickle.loads(data)
+
+    async def get(self, key: str) -> Any:
+        entry = await self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None,
+                  stale_ttl: float = 0):
+        ttl = ttl or self.default_ttl
+        data = pickle.dumps((value, time.time() + ttl))
+        self.memory.set(key, data, min(ttl + stale_ttl, self.memory_ttl))
+        await self.shared.set(key, data, ttl + stale_ttl)
+
+    async def delete(self, key: str):
+        self.memory.delete(key)
+        await self.shared.delete(key)
+
+    async def get_or_set(self, key: str, factory: Callable[[], Awaitable[Any]],
+                         ttl: Optional[float] = None, stale_ttl: float = 0) -> Any:
+        entry = await self.get_entry(key)
+        if entry is not None:
+            value, fresh_until = entry
+            if fresh_until <= time.time() and not self._flights.in_flight(key):
+                task = asyncio.create_task(self._flights.do(
+                    key, lambda: self._get_or_compute_shared(key, factory, ttl, stale_ttl, wait=False)))
+                # Hold a reference so the refresh is not garbage collected
+                self._refresh_tasks.add(task)
+                task.add_done_callback(self._refresh_done)
+            return value
+
+        return await self._flights.do(
+            key, lambda: self._get_or_compute_shared(key, factory, ttl, stale_ttl, wait=True))
+
+    def _refresh_done(self, task: asyncio.Task):
+        self._refresh_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Background cache refresh failed: {}".format(task.exception()))
+
+    async def _get_fresh(self, key: str) -> Any:
+        entry = await self.get_entry(key)
+        if entry is not None and entry[1] > time.time():
+            return entry[0]
+        return None
+
+    async def _get_or_compute_shared(self, key: str, factory: Callable[[], Awaitable[Any]],
+                                     ttl: Optional[float], stale_ttl: float, wait: bool) -> Any:
+        deadline = time.monotonic() + self.lock_timeout
+        while not await self.shared.acquire(key, self.lock_timeout):
+            # A refresh of a stale entry leaves it to the worker holding the lock
+            if not wait:
+                return None
+            # Another worker is computing, wait for it to publish the value
+            await asyncio.sleep(self.poll_interval)
+            value = await self._get_fresh(key)
+            if value is not None:
+                return value
+            if time.monotonic() >= deadline:
+                logger.warning("Timed out waiting on shared cache lock for {}".format(key))
+                return await self._compute(key, factory, ttl, stale_ttl)
+
+        try:
+            # The value may have landed between the miss and the lock
+            value = await self._get_fresh(key)
+            if value is not None:
+                return value
+            return await self._compute(key, factory, ttl, stale_ttl)
+        finally:
+            await self.shared.release(key)
+
+    async def _compute(self, key: str, factory: Callable[[], Awaitable[Any]],
+                       ttl: Optional[float], stale_ttl: float) -> Any:
+        value = await factory()
+        if value is not None:
+            await self.set(key, value, ttl, stale_ttl)
+        return value
+
+    async def close(self):
+        for task in list(self._refresh_tasks):
+            task.cancel()
+        await self.shared.close()
+
+
+def create_cache() -> TwoTierCache:
+    """
+    Builds the cache from the environment, using Redis when CACHE_REDIS_URL is
+    set and a file store under CACHE_DIR otherwise.
+    """
+    redis_url = os.getenv("CACHE_REDIS_URL")
+    if redis_url:
+        shared = RedisTier(url=redis_url)
+    else:
+        shared = FileTier(directory=os.getenv("CACHE_DIR", "/tmp/pulsebot-cache"))
+    return TwoTierCache(
+        shared=shared,
+        default_ttl=float(os.getenv("CACHE_TTL", 300)),
+        max_entries=int(os.getenv("CACHE_MAX_ENTRIES", 256)),
+        max_bytes=int(os.getenv("CACHE_MAX_BYTES", 32 * 1024 * 1024))
+    )
+
+
+def cached(ttl: Optional[float] = None, stale_ttl: float = 0):
+    """
+    Caches the result of an async function keyed on its name and arguments,
+    coalescing concurrent misses into a single call. With a stale_ttl,
+    expired results keep being served for up to stale_ttl seconds while one
+    background call refreshes them. The wrapper's refresh method recomputes
+    and stores a result unconditionally, for cache warming.
+    """
+    def decorator(func):
+        def build_key(args, kwargs) -> str:
+            return "{}.{}:{}:{}".format(func.__module__, func.__name__, args, sorted(kwargs.items()))
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = build_key(args, kwargs)
+            return await get_cache().get_or_set(key, lambda: func(*args, **kwargs), ttl, stale_ttl)
+
+        async def refresh(*args, **kwargs):
+            value = await func(*args, **kwargs)
+            if value is not None:
+                await get_cache().set(build_key(args, kwargs), value, ttl, stale_ttl)
+            return value
+
+        wrapper.refresh = refresh
+        return wrapper
+    return decorator
+
+
+def set_cache(instance: TwoTierCache):
+    global _cache_instance
+    _cache_instance = instance
+
+def get_cache() -> TwoTierCache:
+    if _cache_instance is None:
+        raise Exception("Cache instance has not been initialized")
+    return _cache_instance
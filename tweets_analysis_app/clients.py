@@ -2,6 +2,7 @@ import os
 # from dotenv import load_dotenv
 from azure.search.documents.aio import SearchClient
 from azure.keyvault.secrets.aio import SecretClient
+from azure.storage.blob.aio import BlobServiceClient
 from openai import AsyncAzureOpenAI
 from azure.core.credentials import AzureKeyCredential
 from azure.identity.aio import DefaultAzureCredential, get_bearer_token_provider
@@ -19,6 +20,8 @@ class AzureClients:
                                           credential=self._credential)
         self._search_client = None
         self._openai_client = None
+        self._blob_service_client = None
+        self.blob_container = None
         self.openai_embedding_deployment = None
         self.openai_completions_deployment = None
         self.search_suggester = None
@@ -33,6 +36,8 @@ class AzureClients:
             self.openai_embedding_deployment = (await self._secret_client.get_secret("OPENAI-EMBEDDING-DEPLOYMENT-NAME")).value
             self.openai_completions_deployment = (await self._secret_client.get_secret("OPENAI-COMPLETIONS-DEPLOYMENT-NAME")).value
             self.search_suggester = (await self._secret_client.get_secret("SEARCH-SUGGESTER-NAME")).value
+            blob_url = (await self._secret_client.get_secret("TWEETS-BLOB-URL")).value
+            self.blob_container = (await self._secret_client.get_secret("TWEETS-BLOB-CONTAINER")).value
 
             self._search_client = SearchClient(endpoint=search_endpoint, index_name=search_index_name,
                                         credential=AzureKeyCredential(search_key))
@@ -40,6 +45,8 @@ class AzureClients:
             self._openai_client = AsyncAzureOpenAI(azure_endpoint=openai_endpoint, 
                                                 azure_ad_token_provider=self._token_provider,
                                                 api_version=openai_api_version)
+
+            self._blob_service_client = BlobServiceClient(account_url=blob_url, credential=self._credential)
     
     @property
     def search_client(self):
@@ -53,10 +60,16 @@ class AzureClients:
             raise Exception("OpenAI client has not been initialized.")
         return self._openai_client
 
+    @property
+    def blob_service_client(self):
+        if self._blob_service_client is None:
+            raise Exception("Blob service client has not been initialized.")
+        return self._blob_service_client
     
     async def close(self):
         await self._search_client.close()
         await self._openai_client.close()
+        await self._blob_service_client.close()
         await self._credential.close()
 
 
@@ -1,23 +1,24 @@
 from fastapi import FastAPI, Request, Query, Depends
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse, JSONResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse, JSONResponse, Response
 from typing import Optional
 from datetime import datetime, timedelta
-from aiocache import caches
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
+import asyncio
 import logging
 from pathlib import Path
 from tweets_analysis_app.clients import AzureClients, set_azure_clients
+from tweets_analysis_app.cache import create_cache, set_cache
 logging.basicConfig(level=logging.DEBUG)
-logging.getLogger("aiocache").setLevel(logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 
-from tweets_analysis_app.services.dashboard_service import get_dashboard_data
-from tweets_analysis_app.models.dashboard import DashboardData
+from tweets_analysis_app.services.dashboard_service import get_dashboard_json, stream_dashboard_data, dashboard_max_age
+from tweets_analysis_app.services.warming_service import run_cache_warmer
 
 from tweets_analysis_app.services.chat_service import stream_chat_response, format_as_ndjson, get_search_suggestions
+from tweets_analysis_app.services.context_service import get_encoder
 from tweets_analysis_app.models.chat import ChatRequest
 
 @asynccontextmanager
@@ -26,7 +27,17 @@ async def lifespan(app: FastAPI):
     await azure_clients.init_clients()
     set_azure_clients(azure_clients)
     logger.info("Initiated Azure clients")
+    cache = create_cache()
+    set_cache(cache)
+    logger.info("Initiated cache")
+    await asyncio.to_thread(get_encoder)
+    logger.info("Loaded tokenizer")
+    warmer = asyncio.create_task(run_cache_warmer())
     yield
+    warmer.cancel()
+    with suppress(asyncio.CancelledError):
+        await warmer
+    await cache.close()
     await azure_clients.close()
 
 app = FastAPI(
@@ -42,18 +53,6 @@ templates = Jinja2Templates(directory=TEMPLATES_DIR)
 app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
     
     
-caches.set_config(
-    {
-        "default": {
-            "cache": "aiocache.SimpleMemoryCache", 
-            "serializer": {
-                "class": "aiocache.serializers.JsonSerializer"
-            }, 
-            "ttl": 300
-        }
-    }
-)
-
 
 @app.get("/")
 async def home():
@@ -61,33 +60,73 @@ async def home():
     return RedirectResponse(url="/dashboard")
     
 
+def resolve_date_range(start_date: Optional[str], end_date: Optional[str]):
+    today = datetime.now().date()
+    start = start_date or (today - timedelta(days=7)).isoformat()
+    end = end_date or today.isoformat()
+    return start, end
+
+
 @app.get("/dashboard", response_class=HTMLResponse)
 async def dashboard(
     request: Request,
     start_date: Optional[str] = Query(None, description="Start date in YYYY-MM-DD"),
     end_date: Optional[str] = Query(None, description="End date in YYYY-MM-DD")
 ):
-    print("Inside dashboard func")
     logger.info("inside dashboard func in main")
-    today = datetime.now().date()
-    start = start_date or (today - timedelta(days=7)).isoformat()
-    end = end_date or today.isoformat()
+    start, end = resolve_date_range(start_date, end_date)
     logger.info("Start: {}".format(start))
     logger.info("End: {}".format(end))
 
-    logger.info("Called query dashboard")
-    data: DashboardData = await get_dashboard_data(start, end)
-
-    logger.info("Returned query dashboard")
+    # The page loads its data from /dashboard/stream and draws each part as it arrives
     return templates.TemplateResponse("dashboard.html",
                                       {
                                           "request": request, 
                                           "start_date": start, 
-                                          "end_date": end, 
-                                          "data": data
+                                          "end_date": end
                                       })
 
 
+@app.get("/dashboard/stream", response_class=StreamingResponse)
+async def dashboard_stream(
+    start_date: Optional[str] = Query(None, description="Start date in YYYY-MM-DD"),
+    end_date: Optional[str] = Query(None, description="End date in YYYY-MM-DD")
+):
+    start, end = resolve_date_range(start_date, end_date)
+
+    return StreamingResponse(
+        content=format_as_ndjson(stream_dashboard_data(start, end)),
+        media_type="application/x-ndjson"
+    )
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so a W/ prefix is ignored
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+@app.get("/api/dashboard")
+async def dashboard_api(
+    request: Request,
+    start_date: Optional[str] = Query(None, description="Start date in YYYY-MM-DD"),
+    end_date: Optional[str] = Query(None, description="End date in YYYY-MM-DD")
+):
+    start, end = resolve_date_range(start_date, end_date)
+    body, etag = await get_dashboard_json(start, end)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, max-age={0}, stale-while-revalidate={0}".format(dashboard_max_age)
+    }
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 @app.get("/chat", response_class=HTMLResponse)
 async def load_chat(request: Request):
     return templates.TemplateResponse("chat.html", {"request": request})
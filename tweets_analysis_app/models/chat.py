@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 
 class Message(BaseModel):
@@ -19,4 +19,10 @@ class Choice(BaseModel):
 
 class ChatResponse(BaseModel):
     object: str = "chat.completion"
-    choices: List[Choice]
\ No newline at end of file
+    choices: List[Choice]
+
+# Model for a chat answer kept by the semantic cache
+class CachedAnswer(BaseModel):
+    answer: str
+    citations: List[Dict]
+    followup_questions: List[str]
@@ -67,6 +67,23 @@ class PopularTweet(BaseModel):
         data["formatted_created_at"] = self.formatted_created_at
         return data
 
+# Model for pre-aggregated dashboard metrics of a single day
+class DailyRollup(BaseModel):
+    date: str
+    count: int
+    sentiment_counts: Dict[str, int]
+    language_counts: Dict[str, int]
+    entity_counts: Dict[str, int]
+    entity_urls: Dict[str, str]
+
+# Model for the dashboard metrics that are derived from daily rollups
+class DashboardCharts(BaseModel):
+    date_counts: List[DateCountObj]
+    sentiment_label_counts: List[SentimentLabelCountObj]
+    date_sentiment_scores: List[DateSentimentScoreObj]
+    language_counts: List[LanguageCountObj]
+    entity_counts: List[EntityCountObj]
+
 class DashboardData(BaseModel):
     date_counts: List[DateCountObj]
     sentiment_label_counts: List[SentimentLabelCountObj]
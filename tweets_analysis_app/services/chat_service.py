@@ -1,14 +1,55 @@
-import re, json
-from typing import AsyncGenerator, List
-from aiocache import cached
+import os, re, json, time, asyncio
+from typing import AsyncGenerator, Dict, List, Optional
+from tweets_analysis_app.cache import cached, get_cache, MemoryTier, CacheStats
+from tweets_analysis_app.services.single_flight import SingleFlight
 from azure.search.documents.models import VectorizableTextQuery
-from tweets_analysis_app.models.chat import ChatRequest, Message
+from tweets_analysis_app.models.chat import ChatRequest, Message, CachedAnswer
+from tweets_analysis_app.services.semantic_cache import SemanticCache
+from tweets_analysis_app.services.context_service import build_rag_messages
+from tweets_analysis_app.services.followup_parser import FollowupParser
+from tweets_analysis_app.services.data_version import get_data_version
 from tweets_analysis_app.clients import get_azure_clients
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+# Searches the raw user query while the rewrite is generated, then searches
+# the rewrite too only when it differs meaningfully from the raw query
+speculative_retrieval = os.getenv("CHAT_SPECULATIVE_RETRIEVAL", "true").lower() == "true"
+
+# Rewrites whose terms overlap the raw query at least this much reuse its results
+rewrite_similarity_threshold = 0.6
+
+# Documents retrieved per query and kept after merging
+k_nearest_neighbors = 10
+
+
+# Single-turn questions this similar to a cached one are answered from the
+# cache. Entries are dropped when ingestion publishes a new data version, and
+# after the TTL at the latest.
+# With text-embedding-3 models rewordings of the same question score around
+# 0.88-0.95 while different questions about the same topic stay below about
+# 0.85, so 0.95 missed most rewordings. Lower it for more hits, raise it if
+# answers get reused across different questions; the best similarity of each
+# lookup is logged at debug level to calibrate against real traffic
+semantic_cache = SemanticCache(
+    threshold=float(os.getenv("CHAT_CACHE_THRESHOLD", 0.9)),
+    ttl=float(os.getenv("CHAT_CACHE_TTL", 60 * 60 * 24)),
+    max_entries=int(os.getenv("CHAT_CACHE_MAX_ENTRIES", 512))
+)
+
+
+# Rewrites are deterministic (temperature 0) so they are memoized on the
+# normalized question. The shared tier lets workers reuse each other's rewrites
+rewrite_cache = MemoryTier(max_entries=int(os.getenv("CHAT_REWRITE_CACHE_MAX_ENTRIES", 1024)),
+                           max_bytes=1024 * 1024)
+rewrite_cache_ttl = 60 * 60 * 24
+rewrite_cache_shared = os.getenv("CHAT_REWRITE_CACHE_SHARED", "false").lower() == "true"
+rewrite_stats = CacheStats()
+rewrite_flights = SingleFlight()
+
+
 rewrite_system_prompt = """Below is a history of the conversation so far, and a new question asked by the user that needs to be answered by searching in a knowledge.
     You have access to Azure AI Search index with 100's of documents.
     Generate a search query based on the conversation and the new question.
@@ -109,16 +150,46 @@ Make sure the last follow-up ends with ">>".
 """
 
 
-def extract_followups(content: str) -> List[str]:
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
 
-    questions = re.findall(r"<<(.*?)>>", content)
-    return questions
 
 async def rewrite_query(messages: List[Message]) -> str:
+    """
+    Returns the search query for the last user message, from the rewrite
+    cache when the same normalized question was rewritten before.
+    """
+    clients = get_azure_clients()
+    user_query = messages[-1].content
+    key = "rewrite:{}:{}".format(clients.openai_completions_deployment, normalize_query(user_query))
+
+    start = time.perf_counter()
+    rewritten_query = await get_cached_rewrite(key)
+    hit = rewritten_query is not None
+    if not hit:
+        # Users clicking the same follow-up at once share one completion
+        rewritten_query = await rewrite_flights.do(key, lambda: generate_rewrite(key, user_query))
+    rewrite_stats.record(hit, time.perf_counter() - start)
+    logging.info("Rewrite cache {}: {}".format("hit" if hit else "miss", rewrite_stats.snapshot()))
+    return rewritten_query
+
+
+async def get_cached_rewrite(key: str) -> Optional[str]:
+    data = rewrite_cache.get(key)
+    if data is not None:
+        return data.decode()
+    if rewrite_cache_shared:
+        value = await get_cache().get(key)
+        if value is not None:
+            rewrite_cache.set(key, value.encode(), rewrite_cache_ttl)
+            return value
+    return None
+
+
+async def generate_rewrite(key: str, user_query: str) -> str:
     clients = get_azure_clients()
     openai_client = clients.openai_client
 
-    user_query = messages[-1].content
     rewrite_messages = [{"role": "system", "content": rewrite_system_prompt}] + rewrite_few_shots
     rewrite_messages.append({"role": "user", "content": f"Generate search query for: {user_query}"})
 
@@ -133,57 +204,187 @@ async def rewrite_query(messages: List[Message]) -> str:
         logging.info(f"OpenAI response: {completion}")
         response = completion.choices[0].message.content.strip()
     except Exception as e:
-        logging.exception("Error in rewrite_query: %s", e)
+        logging.exception("Error in generate_rewrite: %s", e)
         raise
 
     if not response or response == "0":
-        return user_query
+        response = user_query
+
+    rewrite_cache.set(key, response.encode(), rewrite_cache_ttl)
+    if rewrite_cache_shared:
+        await get_cache().set(key, response, ttl=rewrite_cache_ttl)
     return response
 
-async def stream_chat_response(request: ChatRequest) -> AsyncGenerator[str, None]:
+
+async def vector_search(query: str) -> List[Dict]:
     clients = get_azure_clients()
     search_client = clients.search_client
-    openai_client = clients.openai_client
 
-    user_query = request.messages[-1].content
-    logging.info(f"User query: {user_query}")
+    results = await search_client.search(
+        vector_queries=[VectorizableTextQuery(
+            text=query, 
+            k_nearest_neighbors=k_nearest_neighbors,
+            fields="text_vector"
+        )], 
+        filter="language eq 'en'",
+        select=["text", "created_at", "source_url"]
+    )
+    return [doc async for doc in results]
+
+
+def query_terms(query: str) -> set:
+    return set(re.findall(r"\w+", query.lower()))
+
+
+def differs_meaningfully(query: str, other_query: str) -> bool:
+    """
+    Compares the word sets of two queries, ignoring case, punctuation and
+    word order.
+    """
+    terms, other_terms = query_terms(query), query_terms(other_query)
+    if not terms or not other_terms:
+        return terms != other_terms
+    similarity = len(terms & other_terms) / len(terms | other_terms)
+    return similarity < rewrite_similarity_threshold
+
+
+def merge_documents(*doc_lists: List[Dict]) -> List[Dict]:
+    """
+    Merges search results by source_url, keeping the best scored copy of each
+    document, and returns the top k_nearest_neighbors by score.
+    """
+    merged = {}
+    for docs in doc_lists:
+        for doc in docs:
+            key = doc.get("source_url") or doc.get("text")
+            if key not in merged or doc.get("@search.score", 0) > merged[key].get("@search.score", 0):
+                merged[key] = doc
+    return sorted(merged.values(), key=lambda doc: doc.get("@search.score", 0), reverse=True)[:k_nearest_neighbors]
+
+
+async def retrieve_documents(messages: List[Message],
+                             raw_search: Optional[asyncio.Task] = None) -> List[Dict]:
+    """
+    Searches the rewrite of the last user message. With speculative retrieval
+    the raw query is searched alongside, raw_search is that search when the
+    caller already started it.
+    """
+    user_query = messages[-1].content
+
+    if not speculative_retrieval:
+        rewritten_query = await rewrite_query(messages)
+        logging.info(f"Rewritten query: {rewritten_query}")
+        return await vector_search(rewritten_query)
+
+    if raw_search is None:
+        raw_search = asyncio.create_task(vector_search(user_query))
     try:
-        rewritten_query = await rewrite_query(request.messages)
+        try:
+            rewritten_query = await rewrite_query(messages)
+        except Exception:
+            # The raw query results are still a usable answer context
+            logging.warning("Query rewrite failed, using raw query results")
+            return await raw_search
         logging.info(f"Rewritten query: {rewritten_query}")
 
-        results = await search_client.search(
-            vector_queries=[VectorizableTextQuery(
-                text=rewritten_query, 
-                k_nearest_neighbors=10,
-                fields="text_vector"
-            )], 
-            filter="language eq 'en'",
-            select=["text", "created_at", "source_url"]
-        )
+        if not differs_meaningfully(user_query, rewritten_query):
+            return await raw_search
 
-        docs = [doc async for doc in results]
-        context = "\n".join([f"- {doc.get('text')}" for doc in docs])
-        logging.info(context)
+        rewritten_docs, raw_docs = await asyncio.gather(vector_search(rewritten_query), raw_search)
+        return merge_documents(rewritten_docs, raw_docs)
+    finally:
+        raw_search.cancel()
 
-        rag_messages = [{"role": "system", "content": rag_system_prompt}]
 
-        rag_messages += [msg.model_dump() for msg in request.messages[:-1]]
+async def embed_query(query: str) -> List[float]:
+    clients = get_azure_clients()
+    openai_client = clients.openai_client
+
+    response = await openai_client.embeddings.create(
+        model=clients.openai_embedding_deployment,
+        input=query
+    )
+    return response.data[0].embedding
 
-        rag_messages.append({
-            "role": "user",
-            "content": f"{user_query}\n\nContext:\n{context}"
-        })
 
-        yield {
-            "choices": [{
-                "delta": {"role": "assistant"},
-                "index": 0,
-            }],
-            "object": "chat.completion.chunk"
-        }
+def role_event() -> dict:
+    return {
+        "choices": [{
+            "delta": {"role": "assistant"},
+            "index": 0,
+        }],
+        "object": "chat.completion.chunk"
+    }
+
+
+def content_event(content: str) -> dict:
+    return {
+        "choices": [{
+            "delta": {"content": content},
+            "index": 0,
+        }],
+        "object": "chat.completion.chunk"
+    }
 
-        followup_started = False
-        followup_content = ""
+
+def context_event(citations: List[dict], followup_questions: List[str]) -> dict:
+    return {
+        "choices": [{
+            "delta": {"role": "assistant"},
+            "context": {
+                "data_points": citations,
+                "followup_questions": followup_questions
+            },
+            "index": 0,
+            "finish_reason": "stop"
+        }],
+        "object": "chat.completion.chunk"
+    }
+
+
+async def stream_chat_response(request: ChatRequest) -> AsyncGenerator[str, None]:
+    clients = get_azure_clients()
+    openai_client = clients.openai_client
+
+    user_query = request.messages[-1].content
+    logging.info(f"User query: {user_query}")
+    # The raw query search starts right away so a cache miss does not wait for
+    # the embedding first. It is cancelled on a hit, and the rewrite only runs
+    # after a miss so hits do not pay for a completion
+    raw_search = None
+    if speculative_retrieval:
+        raw_search = asyncio.create_task(vector_search(user_query))
+    try:
+        # Answers to follow-ups depend on the conversation, only first questions are cached
+        query_vector, data_version = None, None
+        if len(request.messages) == 1:
+            try:
+                query_vector, data_version = await asyncio.gather(
+                    embed_query(user_query), get_data_version())
+            except Exception as e:
+                logging.warning("Semantic cache unavailable: %s", e)
+
+        if query_vector is not None:
+            cached_answer = semantic_cache.lookup(query_vector, data_version)
+            if cached_answer is not None:
+                logging.info("Semantic cache hit for: {}".format(user_query))
+                if raw_search is not None:
+                    raw_search.cancel()
+                yield role_event()
+                yield content_event(cached_answer.answer)
+                yield context_event(cached_answer.citations, cached_answer.followup_questions)
+                return
+
+        retrieved_docs = await retrieve_documents(request.messages, raw_search)
+        # Only the documents that fit the context budget are sent and cited
+        rag_messages, docs = build_rag_messages(rag_system_prompt, request.messages, retrieved_docs)
+        logging.info(rag_messages[-1]["content"])
+
+        yield role_event()
+
+        parser = FollowupParser()
+        answer_parts = []
+        followup_questions = []
         stream = await openai_client.chat.completions.create(
             model=clients.openai_completions_deployment,
             messages=rag_messages,
@@ -191,26 +392,28 @@ async def stream_chat_response(request: ChatRequest) -> AsyncGenerator[str, None
             stream=True
         )
 
+        # Runs once per token, so only attribute reads and the parser happen here
         async for event_chunk in stream:
-            chunk = event_chunk.model_dump()
-            if not chunk.get("choices") or not chunk["choices"]:
-                continue 
-            delta = chunk["choices"][0]["delta"]
-            content = delta.get("content") or ""
-            logging.info(f"Content: {content}")
-            if "<<" in content:
-                followup_started = True
-                before = content[:content.index("<<")].strip()
-                after = content[content.index("<<"):].strip()
-                if before:
-                    chunk["choices"][0]["delta"]["content"] = before
-                    yield chunk
-                followup_content += after
-            elif followup_started:
-                followup_content += content
-            else:
-                yield chunk
-            
+            if not event_chunk.choices:
+                continue
+            content = event_chunk.choices[0].delta.content
+            if not content:
+                continue
+            answer, completed = parser.feed(content)
+            followup_questions.extend(completed)
+            if answer:
+                answer_parts.append(answer)
+                yield content_event(answer)
+
+        answer, completed = parser.close()
+        followup_questions.extend(completed)
+        if answer:
+            answer_parts.append(answer)
+            yield content_event(answer)
+        answer_content = "".join(answer_parts)
+        logging.info("Streamed answer of {} characters with {} follow-ups".format(
+            len(answer_content), len(followup_questions)))
+
         citations = [
             {
                 "url": doc.get("source_url"), 
@@ -220,27 +423,20 @@ async def stream_chat_response(request: ChatRequest) -> AsyncGenerator[str, None
             for doc in docs if doc.get("source_url")
         ]
 
-        followup_questions = []
-        if followup_content:
-            logging.info(followup_content)
-            followup_questions = extract_followups(followup_content)
-            logging.info(followup_questions)
-            
-        yield {
-            "choices": [{
-                "delta": {"role": "assistant"},
-                "context": {
-                    "data_points": citations,
-                    "followup_questions": followup_questions
-                },
-                "index": 0,
-                "finish_reason": "stop"
-            }],
-            "object": "chat.completion.chunk"
-        }
+        yield context_event(citations, followup_questions)
+
+        if query_vector is not None and answer_content:
+            semantic_cache.add(query_vector, data_version, CachedAnswer(
+                answer=answer_content,
+                citations=citations,
+                followup_questions=followup_questions
+            ))
     except Exception as e:
         logging.exception("Error in stream_chat_response: %s", e)
         raise
+    finally:
+        if raw_search is not None:
+            raw_search.cancel()
 
 
 async def format_as_ndjson(r: AsyncGenerator[dict, None]) -> AsyncGenerator[str, None]:
@@ -252,7 +448,7 @@ async def format_as_ndjson(r: AsyncGenerator[dict, None]) -> AsyncGenerator[str,
         yield json.dumps({"error": str(error)}) + "\n"
 
 
-@cached(ttl=60)
+@cached(ttl=60, stale_ttl=60)
 async def get_search_suggestions(query: str) -> List[str]:
     clients = get_azure_clients()
     search_client = clients.search_client
@@ -0,0 +1,127 @@
+import os
+import re
+from typing import Dict, List, Tuple
+import tiktoken
+from tweets_analysis_app.models.chat import Message
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Same encoding the ingestion chunker counts tokens with
+encoding_model = os.getenv("CHAT_ENCODING_MODEL", "text-embedding-3-small")
+
+# Prompt token budgets for the retrieved tweets and the earlier conversation
+context_token_budget = int(os.getenv("CHAT_CONTEXT_TOKENS", 3000))
+history_token_budget = int(os.getenv("CHAT_HISTORY_TOKENS", 1500))
+
+# Tokens the chat format adds around every message
+message_overhead_tokens = 4
+
+# Tweets whose normalized words overlap at least this much are treated as copies
+duplicate_similarity_threshold = 0.8
+
+_encoder = None
+
+
+def get_encoder() -> tiktoken.Encoding:
+    """
+    Returns the tokenizer, loading it on the first call. Loading reads or
+    downloads the encoding file, so the app loads it at startup rather than
+    on the event loop during a request.
+    """
+    global _encoder
+    if _encoder is None:
+        _encoder = tiktoken.encoding_for_model(encoding_model)
+    return _encoder
+
+
+def count_tokens(text: str) -> int:
+    return len(get_encoder().encode(text))
+
+
+def tweet_terms(text: str) -> frozenset:
+    """
+    Returns the words of a tweet without the retweet prefix, mentions and
+    links, so retweets and reposts of the same headline compare equal.
+    """
+    text = re.sub(r"^RT @\w+:", "", text.strip())
+    text = re.sub(r"https?://\S+|@\w+", "", text.lower())
+    return frozenset(re.findall(r"\w+", text))
+
+
+def dedupe_documents(docs: List[Dict]) -> List[Dict]:
+    """
+    Drops documents whose text nearly duplicates a document earlier in the
+    list, keeping the first, best ranked, copy.
+    """
+    kept, kept_terms = [], []
+    for doc in docs:
+        terms = tweet_terms(doc.get("text") or "")
+        if not terms:
+            continue
+        duplicate = any(len(terms & other) / len(terms | other) >= duplicate_similarity_threshold
+                        for other in kept_terms)
+        if not duplicate:
+            kept.append(doc)
+            kept_terms.append(terms)
+    return kept
+
+
+def pack_documents(docs: List[Dict], budget: int) -> Tuple[str, List[Dict]]:
+    """
+    Packs the highest scoring documents into the context until the token
+    budget is spent. Returns the context and the documents it includes.
+    """
+    ranked = sorted(docs, key=lambda doc: doc.get("@search.score", 0), reverse=True)
+
+    lines, packed, used = [], [], 0
+    for doc in ranked:
+        line = "- {}".format(doc.get("text"))
+        # Lines are joined with newlines, which can merge tokens, so this is a
+        # close upper bound rather than an exact count
+        tokens = count_tokens(line) + 1
+        if used + tokens > budget:
+            continue
+        lines.append(line)
+        packed.append(doc)
+        used += tokens
+    return "\n".join(lines), packed
+
+
+def trim_history(messages: List[Message], budget: int) -> List[Dict]:
+    """
+    Keeps the most recent turns of the conversation that fit in the token
+    budget, dropping the oldest turns first.
+    """
+    kept, used = [], 0
+    for message in reversed(messages):
+        tokens = count_tokens(message.content) + message_overhead_tokens
+        if used + tokens > budget:
+            break
+        kept.append(message.model_dump())
+        used += tokens
+    kept.reverse()
+
+    if len(kept) < len(messages):
+        logger.info("Dropped {} old turns to fit the history budget".format(len(messages) - len(kept)))
+    return kept
+
+
+def build_rag_messages(system_prompt: str, messages: List[Message],
+                       docs: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Builds the completion messages for the last user message within the
+    configured token budgets. Returns the messages and the documents placed
+    in the context, which are the ones to cite.
+    """
+    context, packed_docs = pack_documents(dedupe_documents(docs), context_token_budget)
+    logger.info("Packed {} of {} documents into the context".format(len(packed_docs), len(docs)))
+
+    rag_messages = [{"role": "system", "content": system_prompt}]
+    rag_messages += trim_history(messages[:-1], history_token_budget)
+    rag_messages.append({
+        "role": "user",
+        "content": f"{messages[-1].content}\n\nContext:\n{context}"
+    })
+    return rag_messages, packed_docs
@@ -0,0 +1,47 @@
+import os
+import json
+from azure.core.exceptions import AzureError, ResourceNotFoundError
+from tweets_analysis_app.cache import cached
+from tweets_analysis_app.clients import get_azure_clients
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Blob the ingestion app publishes the data version to after each successful
+# indexer run, once the new documents are enriched
+data_version_blob_path = "cdc-data-version.json"
+
+# Seconds a worker reuses the data version before reading it again, the most
+# a cached result can lag behind a new ingestion run
+version_check_interval = 30
+
+# Results keyed on the data version only go stale when the index is changed
+# outside ingestion, so they are kept long and this TTL only bounds that
+versioned_ttl = float(os.getenv("CACHE_VERSIONED_TTL", 60 * 60 * 6))
+
+# Last version read, served while the blob cannot be read
+last_known_version = 0
+
+
+@cached(ttl=version_check_interval)
+async def get_data_version() -> int:
+    """
+    Returns the data version published for the last indexer run, 0 before
+    the first run. The version increases every time new enriched data is
+    searchable. When the blob cannot be read the last version read is
+    returned, so caches keep working on the data they already hold.
+    """
+    global last_known_version
+    clients = get_azure_clients()
+    blob_client = clients.blob_service_client.get_blob_client(
+        container=clients.blob_container, blob=data_version_blob_path)
+    try:
+        downloader = await blob_client.download_blob()
+        last_known_version = json.loads(await downloader.readall())["version"]
+    except ResourceNotFoundError:
+        logger.warning("No data version published yet")
+    except AzureError as e:
+        logger.warning("Could not read the data version, using version %s: %s",
+                       last_known_version, e)
+    return last_known_version
@@ -0,0 +1,87 @@
+from typing import List, Tuple
+
+
+class FollowupParser:
+    """
+    Incremental parser that separates the answer text of a streamed
+    completion from the follow-up questions enclosed in << >>.
+
+    feed is called with each delta and returns the answer text that can be
+    sent right away along with any follow-ups completed by that delta. At most
+    one bracket character and the trailing whitespace of the answer are held
+    back, so a << split across deltas never leaks into the answer and the
+    answer never ends in the whitespace before the follow-ups.
+    """
+    def __init__(self):
+        self._in_followup = False
+        self._pending = ""
+        self._whitespace = ""
+        self._question = []
+
+    def feed(self, text: str) -> Tuple[str, List[str]]:
+        if self._pending:
+            text = self._pending + text
+            self._pending = ""
+
+        answer_parts, completed = [], []
+        pos = 0
+        while pos < len(text):
+            if self._in_followup:
+                end = text.find(">>", pos)
+                if end == -1:
+                    # A single > may be the start of >>, decide on the next delta
+                    if text.endswith(">"):
+                        self._question.append(text[pos:-1])
+                        self._pending = ">"
+                    else:
+                        self._question.append(text[pos:])
+                    break
+                self._question.append(text[pos:end])
+                self._complete_question(completed)
+                pos = end + 2
+            else:
+                start = text.find("<<", pos)
+                if start == -1:
+                    segment = text[pos:]
+                    if segment.endswith("<"):
+                        segment = segment[:-1]
+                        self._pending = "<"
+                    answer_parts.append(self._answer_text(segment))
+                    break
+                answer_parts.append(self._answer_text(text[pos:start]))
+                # Whitespace before the follow-ups is not part of the answer
+                self._whitespace = ""
+                self._in_followup = True
+                pos = start + 2
+
+        return "".join(answer_parts), completed
+
+    def close(self) -> Tuple[str, List[str]]:
+        """
+        Flushes the held back text once the stream ends. An unterminated
+        follow-up is still returned, the model sometimes drops the final >>.
+        """
+        answer, completed = "", []
+        if self._in_followup:
+            # A held back > is the first half of the missing >>
+            self._complete_question(completed)
+        elif self._pending:
+            answer = self._answer_text(self._pending)
+        self._pending = ""
+        self._whitespace = ""
+        return answer, completed
+
+    def _answer_text(self, segment: str) -> str:
+        if not segment:
+            return ""
+        segment = self._whitespace + segment
+        stripped = segment.rstrip()
+        self._whitespace = segment[len(stripped):]
+        return stripped
+
+    def _complete_question(self, completed: List[str]):
+        question = "".join(self._question).strip()
+        if question:
+            completed.append(question)
+        self._question = []
+        self._in_followup = False
@@ -0,0 +1,211 @@
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+from typing import AsyncGenerator, List, Tuple
+from collections import defaultdict
+
+
+from tweets_analysis_app.clients import get_azure_clients
+from tweets_analysis_app.cache import get_cache
+from tweets_analysis_app.services.single_flight import single_flight
+from tweets_analysis_app.services.data_version import versioned_ttl
+from tweets_analysis_app.models.dashboard import DailyRollup, DateCountObj, SentimentLabelCountObj, LanguageCountObj, DateSentimentScoreObj, EntityCountObj
+from tweets_analysis_app.types.validators import consolidate_sentiment_label
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Relevance is scored at ingest, the dashboard leaves out tweets flagged not
+# relevant. Documents indexed before the flag existed have no value and were
+# all pulled by CDC keyword queries, so they are still counted
+relevant_filter = "is_cdc_relevant ne false"
+
+# Days older than this are assumed fully indexed, so their rollups are kept long.
+# Rollups of open days are keyed on the data version and rebuilt for each new one
+settled_days = 2
+settled_rollup_ttl = 60 * 60 * 24 * 30
+open_rollup_ttl = versioned_ttl
+
+# Documents requested per page while streaming a day, the service maximum
+page_size = 1000
+
+# Entities kept per day, more than the dashboard shows so merged ranges stay accurate
+entities_per_day = 50
+entities_per_range = 10
+
+# Limit on days computed at once when many rollups are missing
+max_concurrent_days = 8
+
+
+def is_settled(day: date) -> bool:
+    today = datetime.now(timezone.utc).date()
+    return (today - day).days > settled_days
+
+
+def rollup_key(day: date, data_version: int) -> str:
+    if is_settled(day):
+        return "rollup:{}".format(day.isoformat())
+    return "rollup:{}:{}".format(day.isoformat(), data_version)
+
+
+async def get_daily_rollups(start_date: str, end_date: str, data_version: int) -> List[DailyRollup]:
+    """
+    Returns the rollup of every day from start_date to end_date, reading
+    stored rollups and computing only the missing days.
+    """
+    start = date.fromisoformat(start_date)
+    end = date.fromisoformat(end_date)
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+    semaphore = asyncio.Semaphore(max_concurrent_days)
+
+    async def get_with_limit(day: date) -> DailyRollup:
+        async with semaphore:
+            return await get_daily_rollup(day, data_version)
+
+    return await asyncio.gather(*[get_with_limit(day) for day in days])
+
+
+async def get_daily_rollup(day: date, data_version: int) -> DailyRollup:
+    stored = await get_cache().get(rollup_key(day, data_version))
+    if stored is not None:
+        return stored
+    return await build_daily_rollup(day, data_version)
+
+
+# Overlapping dashboard ranges missing the same day share one build
+@single_flight()
+async def build_daily_rollup(day: date, data_version: int) -> DailyRollup:
+    """
+    Computes the rollup of a single day by streaming every matching document
+    and stores it. Days that may still receive documents are stored under
+    the data version, settled days are kept for settled_rollup_ttl.
+    """
+    filter_query = "created_at ge {}T00:00:00Z and created_at lt {}T00:00:00Z and {}".format(
+        day.isoformat(), (day + timedelta(days=1)).isoformat(), relevant_filter)
+
+    count = 0
+    sentiment_counts = defaultdict(int)
+    language_counts = defaultdict(int)
+    entity_counts = defaultdict(int)
+    entity_urls = {}
+
+    # Counters are updated one document at a time, memory only grows with the
+    # number of distinct labels and entities, not with the number of documents
+    async for result in stream_documents(filter_query=filter_query,
+                                         select=["id", "created_at", "sentiment", "language", "linked_entities", "linked_entity_urls", "duplicate_count"]):
+        # Near-duplicate tweets are indexed once, weight them by their copies
+        weight = result.get("duplicate_count") or 1
+        count += weight
+        sentiment = result.get("sentiment", None)
+        if sentiment:
+            sentiment_counts[sentiment] += weight
+        language = result.get("language", None)
+        if language:
+            language_counts[language] += weight
+        linked_entities = result.get("linked_entities") or []
+        linked_entity_urls = result.get("linked_entity_urls") or []
+        for entity, url in zip(linked_entities, linked_entity_urls):
+            entity_counts[entity] += weight
+            entity_urls.setdefault(entity, url)
+
+    top_entities = dict(sorted(entity_counts.items(), key=lambda x: x[1], reverse=True)[:entities_per_day])
+
+    rollup = DailyRollup(
+        date=day.isoformat(),
+        count=count,
+        sentiment_counts=sentiment_counts,
+        language_counts=language_counts,
+        entity_counts=top_entities,
+        entity_urls={entity: entity_urls[entity] for entity in top_entities}
+    )
+
+    ttl = settled_rollup_ttl if is_settled(day) else open_rollup_ttl
+    await get_cache().set(rollup_key(day, data_version), rollup, ttl=ttl)
+
+    logger.info("Built rollup for {} with {} tweets".format(day, rollup.count))
+    return rollup
+
+
+async def stream_documents(filter_query: str, select: List[str]) -> AsyncGenerator[dict, None]:
+    """
+    Yields every document matching filter_query using (created_at, id) keyset
+    pagination, so results are not capped at a single page of page_size.
+    The id breaks created_at ties, so each page starts strictly after the
+    last document of the previous one however ties are ordered.
+    """
+    clients = get_azure_clients()
+    search_client = clients.search_client
+
+    last_created_at, last_id = None, None
+    while True:
+        page_filter = filter_query
+        if last_created_at is not None:
+            page_filter = "{} and (created_at gt {} or (created_at eq {} and id gt '{}'))".format(
+                filter_query, last_created_at, last_created_at, last_id.replace("'", "''"))
+
+        results = await search_client.search(
+            filter=page_filter,
+            order_by=["created_at asc", "id asc"],
+            top=page_size,
+            select=select
+        )
+
+        page_count = 0
+        async for result in results:
+            page_count += 1
+            last_created_at, last_id = result.get("created_at"), result.get("id")
+            yield result
+
+        if page_count < page_size:
+            break
+
+
+def merge_daily_rollups(rollups: List[DailyRollup]) -> Tuple[
+        List[DateCountObj], List[SentimentLabelCountObj], List[DateSentimentScoreObj],
+        List[LanguageCountObj], List[EntityCountObj]]:
+    """
+    Merges per-day rollups into the dashboard metrics of the whole range.
+    Daily sentiment averages score positive as 1.0, negative as 0 and
+    everything else (neutral, mixed) as 0.5.
+    """
+    date_counts: List[DateCountObj] = []
+    date_sentiment_scores: List[DateSentimentScoreObj] = []
+    sentiment_label_counts_map = defaultdict(int)
+    language_counts_map = defaultdict(int)
+    entity_counts_map = defaultdict(int)
+    entity_url_map = {}
+
+    for rollup in sorted(rollups, key=lambda x: x.date):
+        if rollup.count == 0:
+            continue
+        day = datetime.fromisoformat(rollup.date)
+        date_counts.append(DateCountObj(date=day, count=rollup.count))
+
+        positive = rollup.sentiment_counts.get("positive", 0)
+        negative = rollup.sentiment_counts.get("negative", 0)
+        neutral = max(rollup.count - positive - negative, 0)
+        score_avg = (positive * 1.0 + neutral * 0.5) / rollup.count
+        date_sentiment_scores.append(DateSentimentScoreObj(date=day, score=score_avg))
+
+        for label, count in rollup.sentiment_counts.items():
+            sentiment_label_counts_map[consolidate_sentiment_label(label)] += count
+        for language, count in rollup.language_counts.items():
+            language_counts_map[language] += count
+        for entity, count in rollup.entity_counts.items():
+            entity_counts_map[entity] += count
+        for entity, url in rollup.entity_urls.items():
+            entity_url_map.setdefault(entity, url)
+
+    sentiment_label_counts = [SentimentLabelCountObj(label=label, count=count) for label, count in sentiment_label_counts_map.items() if count > 0]
+    order = ["Positive", "Neutral", "Negative"]
+    sentiment_label_counts.sort(key=lambda x: order.index(x.label))
+
+    language_counts = [LanguageCountObj(language=language, count=count)
+                       for language, count in sorted(language_counts_map.items(), key=lambda x: x[1], reverse=True)]
+
+    top_entities = sorted(entity_counts_map.items(), key=lambda x: x[1], reverse=True)[:entities_per_range]
+    entity_counts = [EntityCountObj(name=entity, url=entity_url_map.get(entity, "Not found"), count=count)
+                     for entity, count in top_entities]
+
+    return date_counts, sentiment_label_counts, date_sentiment_scores, language_counts, entity_counts
@@ -0,0 +1,82 @@
+import time
+import logging
+import numpy as np
+from typing import List, Optional
+from tweets_analysis_app.models.chat import CachedAnswer
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticCache:
+    """
+    Per-worker cache of chat answers keyed on the embedding of the question.
+    A lookup returns the answer of the most similar cached question when its
+    cosine similarity reaches the threshold.
+
+    Entries are tagged with the data version they were answered from, a
+    lookup against a different version misses so answers never outlive the
+    data they cite. When the cache is full the least recently used entry is
+    replaced.
+
+    The unit length vectors are kept as rows of one matrix so a lookup is a
+    single matrix-vector product instead of a scan on the event loop.
+    """
+    def __init__(self, threshold: float, ttl: float, max_entries: int):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # Allocated on the first add, once the embedding dimensions are known
+        self._vectors = None
+        self._versions = np.zeros(max_entries, dtype=np.int64)
+        self._expires_at = np.zeros(max_entries)
+        self._last_used = np.zeros(max_entries, dtype=np.int64)
+        self._answers = [None] * max_entries
+        self._clock = 0
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _live(self, version: int) -> np.ndarray:
+        return (self._expires_at > time.monotonic()) & (self._versions == version)
+
+    def lookup(self, vector: List[float], version: int) -> Optional[CachedAnswer]:
+        if self._vectors is None:
+            return None
+        live = self._live(version)
+        if not live.any():
+            return None
+
+        # Both vectors are unit length, so the dot product is the cosine similarity
+        similarities = self._vectors @ self._normalize(vector)
+        similarities[~live] = -np.inf
+        best = int(np.argmax(similarities))
+        logger.debug("Semantic cache best similarity %.3f", similarities[best])
+        if similarities[best] < self.threshold:
+            return None
+
+        self._clock += 1
+        self._last_used[best] = self._clock
+        return self._answers[best]
+
+    def add(self, vector: List[float], version: int, answer: CachedAnswer):
+        vector = self._normalize(vector)
+        if self._vectors is None:
+            self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+
+        # Reuse an expired or superseded entry before evicting a live one
+        free = np.flatnonzero(~self._live(version))
+        slot = int(free[0]) if free.size else int(np.argmin(self._last_used))
+
+        self._clock += 1
+        self._vectors[slot] = vector
+        self._versions[slot] = version
+        self._expires_at[slot] = time.monotonic() + self.ttl
+        self._last_used[slot] = self._clock
+        self._answers[slot] = answer
+
+    def clear(self):
+        self._expires_at[:] = 0
+        self._answers = [None] * self.max_entries
@@ -0,0 +1,52 @@
+import asyncio
+import functools
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time. Callers arriving while a call
+    for their key is in flight await the same result instead of starting
+    their own.
+    """
+    def __init__(self):
+        self._calls = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            # The call runs as its own task so it outlives any one caller
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+
+        # Shield so a cancelled caller, the first included, does not cancel the call
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Future):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception retrieved when every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+def single_flight(key_builder: Optional[Callable[..., Hashable]] = None):
+    """
+    Coalesces concurrent calls of an async function with the same arguments
+    into one call whose result is shared by every caller.
+    """
+    def decorator(func):
+        group = SingleFlight()
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if key_builder is not None:
+                key = key_builder(*args, **kwargs)
+            else:
+                key = (args, tuple(sorted(kwargs.items())))
+            return await group.do(key, lambda: func(*args, **kwargs))
+        return wrapper
+    return decorator
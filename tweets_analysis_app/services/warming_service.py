@@ -0,0 +1,89 @@
+import os
+import asyncio
+import random
+import time
+from datetime import date, datetime, timedelta
+from typing import List, Tuple
+
+from tweets_analysis_app.cache import get_cache
+from tweets_analysis_app.services.dashboard_service import get_dashboard_charts, get_popular_tweets, get_dashboard_body, dashboard_ttl
+from tweets_analysis_app.services.data_version import get_data_version, version_check_interval
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Ranges are recomputed at this fraction of the dashboard TTL, before they expire
+warm_interval = dashboard_ttl * 0.8
+warm_jitter = dashboard_ttl * 0.1
+
+# Seconds between checks for a new data version
+check_interval = version_check_interval
+
+# Shared state so only one worker warms each interval
+warm_state_key = "warming:state"
+warm_lock_key = "warming:lock"
+
+# Seconds the warm lock is held at most. A cold warm rebuilds the daily rollups
+# of every range, so this has to outlast the slowest warm or a second worker
+# takes the expired lock and warms the same ranges again
+warm_lock_ttl = float(os.getenv("CACHE_WARM_LOCK_TTL", 15 * 60))
+
+
+def common_ranges(today: date) -> List[Tuple[str, str]]:
+    """
+    Returns the (start_date, end_date) ranges most dashboard requests hit: the
+    default last 7 days, the last 30 days and the current month.
+    """
+    return [
+        ((today - timedelta(days=7)).isoformat(), today.isoformat()),
+        ((today - timedelta(days=30)).isoformat(), today.isoformat()),
+        (today.replace(day=1).isoformat(), today.isoformat())
+    ]
+
+
+async def warm_dashboard_cache(data_version: int):
+    # Rollups of open days are keyed on the data version, so the first range
+    # rebuilds the ones a new version changed and the others reuse them.
+    # Same date default as the /dashboard route so the cache keys match
+    today = datetime.now().date()
+    for start, end in common_ranges(today):
+        await asyncio.gather(get_dashboard_charts.refresh(start, end, data_version),
+                             get_popular_tweets.refresh(start, end, data_version))
+        # Serialized from the parts just refreshed
+        await get_dashboard_body.refresh(start, end, data_version)
+    logger.info("Warmed dashboard cache for {} ranges".format(len(common_ranges(today))))
+
+
+async def run_cache_warmer():
+    """
+    Keeps the common dashboard ranges warm. Every worker runs this loop, the
+    shared state and lock make sure only one of them warms per interval or
+    per data version published by ingestion.
+    """
+    cache = get_cache()
+
+    while True:
+        try:
+            data_version = await get_data_version()
+            state = await cache.get(warm_state_key) or {}
+            new_data = state.get("data_version") != data_version
+            due = state.get("warmed_at", 0) + state.get("interval", warm_interval) <= time.time()
+
+            if (new_data or due) and await cache.shared.acquire(warm_lock_key, warm_lock_ttl):
+                try:
+                    await warm_dashboard_cache(data_version=data_version)
+                    await cache.set(warm_state_key, {
+                        "data_version": data_version,
+                        "warmed_at": time.time(),
+                        # Jitter spreads the next recompute away from other timers
+                        "interval": warm_interval + random.uniform(-warm_jitter, warm_jitter)
+                    }, ttl=dashboard_ttl * 12)
+                finally:
+                    await cache.shared.release(warm_lock_key)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("Error warming dashboard cache: %s", e)
+
+        await asyncio.sleep(check_interval + random.uniform(0, check_interval / 2))
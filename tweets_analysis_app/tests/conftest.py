@@ -0,0 +1,16 @@
+import os
+import sys
+import pytest
+
+# The app is imported as the tweets_analysis_app package from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from tweets_analysis_app.cache import TwoTierCache, FileTier, set_cache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    instance = TwoTierCache(shared=FileTier(directory=str(tmp_path)), poll_interval=0.01)
+    set_cache(instance)
+    yield instance
+    set_cache(None)
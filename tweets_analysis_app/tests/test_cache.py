@@ -0,0 +1,168 @@
+import asyncio
+import time
+import redis.asyncio
+from tweets_analysis_app.cache import TwoTierCache, FileTier, MemoryTier, RedisTier, cached
+
+
+class Factory:
+    """Counts calls and returns the call number after a short delay."""
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        call = self.calls
+        await asyncio.sleep(self.delay)
+        return call
+
+
+def test_memory_tier_evicts_least_recently_used():
+    tier = MemoryTier(max_entries=2, max_bytes=100)
+    tier.set("a", b"1", ttl=60)
+    tier.set("b", b"2", ttl=60)
+    tier.get("a")
+    tier.set("c", b"3", ttl=60)
+
+    assert tier.get("a") == b"1" and tier.get("b") is None and tier.get("c") == b"3"
+
+
+def test_memory_tier_is_bounded_by_bytes():
+    tier = MemoryTier(max_entries=10, max_bytes=10)
+    tier.set("a", b"x" * 6, ttl=60)
+    tier.set("b", b"x" * 6, ttl=60)
+    tier.set("too-big", b"x" * 11, ttl=60)
+
+    assert tier.get("a") is None and tier.get("b") == b"x" * 6 and tier.get("too-big") is None
+
+
+def test_memory_tier_expires_entries():
+    tier = MemoryTier(max_entries=10, max_bytes=100)
+    tier.set("a", b"1", ttl=0)
+
+    assert tier.get("a") is None
+
+
+class FakeRedis:
+    """Keys with no expiry, plus the compare-and-delete release script."""
+    def __init__(self):
+        self.data = {}
+
+    async def set(self, key, value, nx=False, px=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def register_script(self, script):
+        async def release(keys, args):
+            if self.data.get(keys[0]) == args[0]:
+                del self.data[keys[0]]
+        return release
+
+
+def test_redis_lock_is_only_released_by_its_holder(monkeypatch):
+    client = FakeRedis()
+    monkeypatch.setattr(redis.asyncio, "from_url", lambda url: client)
+    first, second = RedisTier("redis://"), RedisTier("redis://")
+
+    async def run():
+        assert await first.acquire("key", timeout=30)
+        assert not await second.acquire("key", timeout=30)
+        # The first lock expires and the second worker takes it
+        del client.data["lock:key"]
+        assert await second.acquire("key", timeout=30)
+        await first.release("key")
+        assert "lock:key" in client.data
+        await second.release("key")
+        assert "lock:key" not in client.data
+
+    asyncio.run(run())
+
+
+def test_concurrent_misses_compute_once(cache):
+    factory = Factory()
+
+    async def run():
+        return await asyncio.gather(*[cache.get_or_set("key", factory, ttl=60) for _ in range(10)])
+
+    assert asyncio.run(run()) == [1] * 10
+    assert factory.calls == 1
+
+
+def test_workers_sharing_a_tier_compute_once(tmp_path):
+    workers = [TwoTierCache(shared=FileTier(directory=str(tmp_path)), poll_interval=0.01)
+               for _ in range(3)]
+    factory = Factory()
+
+    async def run():
+        return await asyncio.gather(*[worker.get_or_set("key", factory, ttl=60)
+                                      for worker in workers])
+
+    assert asyncio.run(run()) == [1, 1, 1]
+    assert factory.calls == 1
+
+
+def test_none_is_not_cached(cache):
+    calls = []
+
+    async def factory():
+        calls.append(1)
+        return None
+
+    async def run():
+        await cache.get_or_set("key", factory, ttl=60)
+        await cache.get_or_set("key", factory, ttl=60)
+
+    asyncio.run(run())
+    assert len(calls) == 2
+
+
+def test_stale_entry_is_served_while_one_refresh_runs(cache):
+    factory = Factory()
+
+    async def run():
+        assert await cache.get_or_set("key", factory, ttl=0.05, stale_ttl=60) == 1
+        await asyncio.sleep(0.1)
+
+        # Expired but within stale_ttl, every caller gets the old value at once
+        started = time.monotonic()
+        values = await asyncio.gather(*[cache.get_or_set("key", factory, ttl=0.05, stale_ttl=60)
+                                        for _ in range(10)])
+        assert time.monotonic() - started < factory.delay
+        assert values == [1] * 10
+
+        await asyncio.sleep(factory.delay * 3)
+        assert await cache.get("key") == 2
+
+    asyncio.run(run())
+    assert factory.calls == 2
+
+
+def test_entry_past_stale_ttl_is_recomputed(cache):
+    factory = Factory(delay=0)
+
+    async def run():
+        await cache.get_or_set("key", factory, ttl=0.02)
+        await asyncio.sleep(0.05)
+        return await cache.get_or_set("key", factory, ttl=0.02)
+
+    assert asyncio.run(run()) == 2
+
+
+def test_cached_keys_on_arguments_and_refreshes(cache):
+    calls = []
+
+    @cached(ttl=60)
+    async def double(value: int) -> int:
+        calls.append(value)
+        return value * 2
+
+    async def run():
+        assert await double(1) == 2
+        assert await double(1) == 2
+        assert await double(2) == 4
+        assert await double.refresh(1) == 2
+
+    asyncio.run(run())
+    assert calls == [1, 2, 1]
@@ -0,0 +1,52 @@
+import asyncio
+import json
+from types import SimpleNamespace
+import pytest
+from azure.core.exceptions import HttpResponseError, ResourceNotFoundError
+from tweets_analysis_app.services import data_version
+
+
+class FakeBlobClient:
+    """Returns the queued versions in order, raising the queued errors."""
+    def __init__(self, results: list):
+        self.results = results
+
+    async def download_blob(self):
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        data = json.dumps({"version": result}).encode()
+
+        async def readall():
+            return data
+        return SimpleNamespace(readall=readall)
+
+
+@pytest.fixture
+def blob_client(monkeypatch):
+    blob_client = FakeBlobClient([])
+    clients = SimpleNamespace(
+        blob_container="tweets",
+        blob_service_client=SimpleNamespace(get_blob_client=lambda **kwargs: blob_client))
+    monkeypatch.setattr(data_version, "get_azure_clients", lambda: clients)
+    monkeypatch.setattr(data_version, "last_known_version", 0)
+    return blob_client
+
+
+def read_versions(count: int) -> list:
+    # Reads the blob each time, bypassing the cached decorator
+    async def run():
+        return [await data_version.get_data_version.__wrapped__() for _ in range(count)]
+    return asyncio.run(run())
+
+
+def test_no_version_published_yet(blob_client):
+    blob_client.results = [ResourceNotFoundError("missing")]
+
+    assert read_versions(1) == [0]
+
+
+def test_unreadable_blob_keeps_the_last_version(blob_client):
+    blob_client.results = [3, HttpResponseError("forbidden"), 4]
+
+    assert read_versions(3) == [3, 3, 4]
@@ -0,0 +1,54 @@
+import random
+import pytest
+from tweets_analysis_app.services.followup_parser import FollowupParser
+
+COMPLETION = ("People are discussing the CDC's vaccine guidance. Some compare x < y "
+              "and a > b in the data.\n\n<<What are the concerns?>>\n<<Where can I get a booster?>>")
+ANSWER = "People are discussing the CDC's vaccine guidance. Some compare x < y and a > b in the data."
+FOLLOWUPS = ["What are the concerns?", "Where can I get a booster?"]
+
+
+def parse(deltas):
+    parser = FollowupParser()
+    answer_parts, followups = [], []
+    for delta in deltas:
+        answer, completed = parser.feed(delta)
+        answer_parts.append(answer)
+        followups.extend(completed)
+    answer, completed = parser.close()
+    answer_parts.append(answer)
+    followups.extend(completed)
+    return "".join(answer_parts), followups
+
+
+def test_whole_completion():
+    assert parse([COMPLETION]) == (ANSWER, FOLLOWUPS)
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_random_splits_parse_the_same(seed):
+    rng = random.Random(seed)
+    deltas, pos = [], 0
+    while pos < len(COMPLETION):
+        size = rng.randint(1, 6)
+        deltas.append(COMPLETION[pos:pos + size])
+        pos += size
+
+    assert parse(deltas) == (ANSWER, FOLLOWUPS)
+
+
+def test_single_character_deltas():
+    assert parse(list(COMPLETION)) == (ANSWER, FOLLOWUPS)
+
+
+def test_unterminated_followup_is_returned_on_close():
+    assert parse(["Answer. <<Is it safe?>"]) == ("Answer.", ["Is it safe?"])
+    assert parse(["Answer. <<Is it", " safe?"]) == ("Answer.", ["Is it safe?"])
+
+
+def test_trailing_bracket_of_the_answer_is_flushed_on_close():
+    assert parse(["Answer <"]) == ("Answer <", [])
+
+
+def test_no_followups():
+    assert parse(["Just an ", "answer.\n"]) == ("Just an answer.", [])
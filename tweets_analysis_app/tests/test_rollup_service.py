@@ -0,0 +1,145 @@
+import asyncio
+import random
+import re
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+import pytest
+from tweets_analysis_app.services import rollup_service
+from tweets_analysis_app.models.dashboard import DailyRollup
+
+KEYSET = re.compile(r"\(created_at gt (\S+) or \(created_at eq (\S+) and id gt '(.*)'\)\)$")
+
+
+class FakeResults:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in self.documents:
+            yield document
+
+
+class FakeSearchClient:
+    """Evaluates the keyset part of the filter and orders by the order_by
+    fields, shuffling documents they do not tell apart like the service may."""
+    def __init__(self, documents, seed=0):
+        self.documents = documents
+        self.rng = random.Random(seed)
+        self.requests = []
+
+    async def search(self, filter, order_by, top, select, skip=0):
+        self.requests.append(filter)
+        documents = list(self.documents)
+        match = KEYSET.search(filter)
+        if match:
+            created_at, _, last_id = match.groups()
+            last_id = last_id.replace("''", "'")
+            documents = [document for document in documents
+                         if (document["created_at"], document["id"]) > (created_at, last_id)]
+        self.rng.shuffle(documents)
+        fields = [clause.split()[0] for clause in order_by]
+        documents.sort(key=lambda document: [document[field] for field in fields])
+        return FakeResults(documents[skip:skip + top])
+
+
+@pytest.fixture
+def search_client(monkeypatch):
+    def install(documents, seed=0):
+        client = FakeSearchClient(documents, seed)
+        monkeypatch.setattr(rollup_service, "get_azure_clients",
+                            lambda: SimpleNamespace(search_client=client))
+        return client
+    return install
+
+
+def make_documents(num_timestamps: int, per_timestamp: int):
+    return [{"id": "{}-{}".format(t, i), "created_at": "2025-05-01T00:{:02d}:00Z".format(t)}
+            for t in range(num_timestamps) for i in range(per_timestamp)]
+
+
+async def collect(generator):
+    return [item async for item in generator]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_stream_documents_returns_ties_across_pages_once(search_client, monkeypatch, seed):
+    monkeypatch.setattr(rollup_service, "page_size", 7)
+    documents = make_documents(num_timestamps=6, per_timestamp=5)
+    client = search_client(documents, seed)
+
+    streamed = asyncio.run(collect(rollup_service.stream_documents("base", ["id", "created_at"])))
+
+    assert sorted(document["id"] for document in streamed) == sorted(document["id"] for document in documents)
+    assert len(client.requests) == 5
+
+
+def test_stream_documents_with_more_ties_than_a_page(search_client, monkeypatch):
+    monkeypatch.setattr(rollup_service, "page_size", 4)
+    documents = make_documents(num_timestamps=1, per_timestamp=10)
+    search_client(documents)
+
+    streamed = asyncio.run(collect(rollup_service.stream_documents("base", ["id", "created_at"])))
+
+    assert [document["id"] for document in streamed] == sorted(document["id"] for document in documents)
+
+
+def test_stream_documents_quotes_ids(search_client, monkeypatch):
+    monkeypatch.setattr(rollup_service, "page_size", 1)
+    client = search_client([{"id": "o'brien", "created_at": "2025-05-01T00:00:00Z"}])
+
+    asyncio.run(collect(rollup_service.stream_documents("base", ["id"])))
+
+    assert client.requests[1].endswith("id gt 'o''brien'))")
+
+
+def test_build_daily_rollup_weights_duplicates(search_client, cache):
+    day = date.today() - timedelta(days=10)
+    created_at = "{}T12:00:00Z".format(day.isoformat())
+    search_client([
+        {"id": "a", "created_at": created_at, "sentiment": "positive", "language": "en",
+         "linked_entities": ["CDC"], "linked_entity_urls": ["https://cdc.gov"], "duplicate_count": 3},
+        {"id": "b", "created_at": created_at, "sentiment": "negative", "language": "es",
+         "linked_entities": ["CDC", "WHO"], "linked_entity_urls": ["https://cdc.gov", "https://who.int"]},
+    ])
+
+    rollup = asyncio.run(rollup_service.build_daily_rollup(day, 1))
+
+    assert rollup.count == 4
+    assert rollup.sentiment_counts == {"positive": 3, "negative": 1}
+    assert rollup.language_counts == {"en": 3, "es": 1}
+    assert rollup.entity_counts == {"CDC": 4, "WHO": 1}
+    # Settled days are stored without the data version
+    assert asyncio.run(cache.get("rollup:{}".format(day.isoformat()))) == rollup
+
+
+def test_rollup_key_of_open_days_includes_the_version():
+    today = datetime.now(timezone.utc).date()
+
+    assert rollup_service.rollup_key(today, 7) == "rollup:{}:7".format(today.isoformat())
+    assert rollup_service.rollup_key(today - timedelta(days=10), 7) == \
+        "rollup:{}".format((today - timedelta(days=10)).isoformat())
+
+
+def test_merge_daily_rollups():
+    rollups = [
+        DailyRollup(date="2025-05-02", count=2, sentiment_counts={"negative": 2},
+                    language_counts={"en": 2}, entity_counts={"CDC": 2},
+                    entity_urls={"CDC": "https://cdc.gov"}),
+        DailyRollup(date="2025-05-01", count=4, sentiment_counts={"positive": 2, "negative": 1},
+                    language_counts={"en": 3, "es": 1}, entity_counts={"CDC": 1, "WHO": 4},
+                    entity_urls={"CDC": "https://cdc.gov", "WHO": "https://who.int"}),
+        DailyRollup(date="2025-05-03", count=0, sentiment_counts={}, language_counts={},
+                    entity_counts={}, entity_urls={}),
+    ]
+
+    date_counts, sentiment_counts, sentiment_scores, language_counts, entity_counts = \
+        rollup_service.merge_daily_rollups(rollups)
+
+    assert [obj.count for obj in date_counts] == [4, 2]
+    assert [obj.score for obj in sentiment_scores] == [(2 + 0.5) / 4, 0.0]
+    # Language codes are shown by name
+    assert {obj.language: obj.count for obj in language_counts} == {"English": 5, "Spanish": 1}
+    assert [(obj.name, obj.count) for obj in entity_counts] == [("WHO", 4), ("CDC", 3)]
@@ -0,0 +1,75 @@
+import numpy as np
+from tweets_analysis_app.services.semantic_cache import SemanticCache
+from tweets_analysis_app.models.chat import CachedAnswer
+
+
+def answer(text: str) -> CachedAnswer:
+    return CachedAnswer(answer=text, citations=[], followup_questions=[])
+
+
+def vectors(count: int, dimensions: int = 64):
+    rng = np.random.default_rng(0)
+    return [rng.standard_normal(dimensions).tolist() for _ in range(count)]
+
+
+def test_similar_question_hits_and_different_one_misses():
+    cache = SemanticCache(threshold=0.9, ttl=60, max_entries=8)
+    first, other = vectors(2)
+    cache.add(first, 1, answer("first"))
+
+    # A scaled and slightly perturbed vector is a rewording of the question
+    reworded = (np.asarray(first) * 3 + 0.1).tolist()
+    assert cache.lookup(reworded, 1).answer == "first"
+    assert cache.lookup(other, 1) is None
+
+
+def test_lookup_misses_other_data_versions():
+    cache = SemanticCache(threshold=0.9, ttl=60, max_entries=8)
+    vector, = vectors(1)
+    cache.add(vector, 1, answer("first"))
+
+    assert cache.lookup(vector, 2) is None
+    assert cache.lookup(vector, 1) is not None
+
+
+def test_empty_cache_misses():
+    assert SemanticCache(threshold=0.9, ttl=60, max_entries=8).lookup(vectors(1)[0], 1) is None
+
+
+def test_expired_entries_miss():
+    cache = SemanticCache(threshold=0.9, ttl=0, max_entries=8)
+    vector, = vectors(1)
+    cache.add(vector, 1, answer("first"))
+
+    assert cache.lookup(vector, 1) is None
+
+
+def test_least_recently_used_entry_is_replaced():
+    cache = SemanticCache(threshold=0.9, ttl=60, max_entries=2)
+    a, b, c = vectors(3)
+    cache.add(a, 1, answer("a"))
+    cache.add(b, 1, answer("b"))
+    cache.lookup(a, 1)
+    cache.add(c, 1, answer("c"))
+
+    assert [cache.lookup(vector, 1) and cache.lookup(vector, 1).answer for vector in (a, b, c)] == \
+        ["a", None, "c"]
+
+
+def test_entries_of_old_versions_are_replaced_first():
+    cache = SemanticCache(threshold=0.9, ttl=60, max_entries=2)
+    a, b, c = vectors(3)
+    cache.add(a, 1, answer("a"))
+    cache.add(b, 2, answer("b"))
+    cache.add(c, 2, answer("c"))
+
+    assert cache.lookup(b, 2).answer == "b" and cache.lookup(c, 2).answer == "c"
+
+
+def test_clear():
+    cache = SemanticCache(threshold=0.9, ttl=60, max_entries=2)
+    vector, = vectors(1)
+    cache.add(vector, 1, answer("a"))
+    cache.clear()
+
+    assert cache.lookup(vector, 1) is None
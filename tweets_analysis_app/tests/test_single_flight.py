@@ -0,0 +1,95 @@
+import asyncio
+import pytest
+from tweets_analysis_app.services.single_flight import SingleFlight, single_flight
+
+
+def test_concurrent_calls_for_a_key_share_one_call():
+    group = SingleFlight()
+    calls = []
+
+    async def fetch(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return key.upper()
+
+    async def run():
+        return await asyncio.gather(*[group.do(key, lambda key=key: fetch(key))
+                                      for key in ["a", "a", "b", "a"]])
+
+    assert asyncio.run(run()) == ["A", "A", "B", "A"]
+    assert sorted(calls) == ["a", "b"]
+    assert not group.in_flight("a")
+
+
+def test_later_calls_run_again():
+    calls = []
+
+    @single_flight()
+    async def fetch(key):
+        calls.append(key)
+        return key
+
+    async def run():
+        await fetch("a")
+        await fetch("a")
+
+    asyncio.run(run())
+    assert calls == ["a", "a"]
+
+
+def test_errors_reach_every_caller():
+    group = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("search failed")
+
+    async def run():
+        return await asyncio.gather(group.do("key", fail), group.do("key", fail),
+                                    return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_cancelled_waiter_does_not_cancel_the_call():
+    group = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return "value"
+
+    async def run():
+        leader = asyncio.create_task(group.do("key", fetch))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(group.do("key", fetch))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return await leader
+
+    assert asyncio.run(run()) == "value"
+
+
+def test_cancelled_first_caller_does_not_fail_waiters():
+    group = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return "value"
+
+    async def run():
+        leader = asyncio.create_task(group.do("key", fetch))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(group.do("key", fetch))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await waiter
+
+    assert asyncio.run(run()) == "value"
+    assert calls == [1]